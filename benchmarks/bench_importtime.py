@@ -0,0 +1,113 @@
+"""
+Startup benchmark for parse2excel, import time (python -X importtime) and "parse2excel -h" wall time,
+heavy packages (openpyxl, textfsm, yaml ...) must not be imported with package import
+
+usage:
+    python benchmarks/bench_importtime.py --runs 10 --output importtime.json
+    python benchmarks/bench_importtime.py --save-baseline importtime_baseline.json
+    python benchmarks/bench_importtime.py --baseline importtime_baseline.json --tolerance 0.3
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+# loaded only by stages which use them
+HEAVY_MODULES = ('openpyxl', 'textfsm', 'yaml', 'pyarrow', 'argparse', 'sqlite3',
+                 'concurrent.futures.process')
+
+
+def import_time_us():
+    """ cumulative import time of parse2excel package in microseconds """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import parse2excel'],
+        capture_output=True, text=True, check=True)
+    for line in reversed(result.stderr.splitlines()):
+        # import time: self [us] | cumulative | imported package
+        fields = [i.strip() for i in line.split('|')]
+        if len(fields) == 3 and fields[2] == 'parse2excel':
+            return int(fields[1])
+    raise Exception(f'parse2excel not found in importtime output: {result.stderr[-500:]}')
+
+
+def cli_help_seconds():
+    """ wall time of "parse2excel -h" """
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, '-m', 'parse2excel.parse2excel', '-h'],
+        capture_output=True, check=True)
+    return time.perf_counter() - start
+
+
+def heavy_modules():
+    """ heavy modules imported by package import """
+    result = subprocess.run(
+        [sys.executable, '-c',
+         'import json, sys, parse2excel; '
+         f'print(json.dumps([i for i in {HEAVY_MODULES!r} if i in sys.modules]))'],
+        capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def run(runs):
+    """ median of runs (first run warms bytecode cache) """
+    import_time_us()
+    imports = [import_time_us() for _ in range(runs)]
+    helps = [cli_help_seconds() for _ in range(runs)]
+    return {
+        'params': {'runs': runs, 'python': sys.version.split()[0]},
+        'stages': [
+            {'stage': 'import parse2excel',
+             'seconds': round(statistics.median(imports) / 1e6, 4)},
+            {'stage': 'parse2excel -h',
+             'seconds': round(statistics.median(helps), 4)},
+        ],
+        'heavy_modules': heavy_modules(),
+    }
+
+
+def compare(result, baseline, tolerance):
+    """ return regression messages, stage slower than baseline * (1 + tolerance) """
+    regressions = []
+    baseline_stages = {i['stage']: i for i in baseline['stages']}
+    for stage in result['stages']:
+        old = baseline_stages.get(stage['stage'])
+        if old and stage['seconds'] > old['seconds'] * (1 + tolerance):
+            regressions.append(
+                f"{stage['stage']}: {stage['seconds']}s > baseline {old['seconds']}s")
+    return regressions
+
+
+def main():
+    ''' benchmark cli '''
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=10, help='runs per measurement (median)')
+    parser.add_argument('--output', help='write result json to file')
+    parser.add_argument('--baseline', help='compare with baseline json, exit 1 on regression')
+    parser.add_argument('--save-baseline', help='write result json as baseline file')
+    parser.add_argument('--tolerance', type=float, default=0.3,
+                        help='allowed slowdown ratio against baseline (default: 0.3)')
+    args = parser.parse_args()
+
+    result = run(max(1, args.runs))
+    text = json.dumps(result, indent=2)
+    print(text)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(text)
+    regressions = [f'heavy module imported: {i}' for i in result['heavy_modules']]
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            regressions += compare(result, json.load(file), args.tolerance)
+    for i in regressions:
+        print(f'REGRESSION {i}', file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+"""
+Pipeline benchmark for parse2excel with synthetic device config files
+
+usage:
+    python benchmarks/bench_pipeline.py --hosts 2000 --interfaces 50 --vlans 20 --output bench.json
+    python benchmarks/bench_pipeline.py --save-baseline baseline.json
+    python benchmarks/bench_pipeline.py --baseline baseline.json --tolerance 0.2
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from openpyxl import Workbook
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+from parse2excel.parse2excel import Excel2Sql, Parsev, Sqljoinv, Textfsmv
+
+# same templates with README example config
+CONFIG = '''
+- type: excel
+  db_name: bench
+  excel_file: inventory.xlsx
+- type: textfsm
+  db_name: bench
+  table_name: ports
+  workers: {workers}
+  folders:
+    - device_configs
+  template: |
+    Value Required Interface (\\S+)
+    Value Interface_Description (\\S+)
+    Value Interface_Ip (\\S+)
+    Value Interface_Mask (\\S+)
+
+    Start
+      ^interface ${{Interface}} -> Begin
+
+    Begin
+      ^ description ${{Interface_Description}}
+      ^ ipv4 address ${{Interface_Ip}} ${{Interface_Mask}}
+      ^! -> Record Start
+- type: textfsm
+  db_name: bench
+  table_name: vlans
+  workers: {workers}
+  folders:
+    - device_configs
+  template: |
+    Value Required Vlan_Number (\\d+)
+    Value Vlan_Desc_Name (\\S+)
+
+    Start
+      ^vlan ${{Vlan_Number}} -> Begin
+
+    Begin
+      ^ name ${{Vlan_Desc_Name}}
+      ^! -> Record Start
+- type: sqlfunction
+  functions:
+    - |
+      def removetxt(d):
+        return d.replace('.txt','')
+- type: sqljoin
+  db_name: bench
+  new_table: ports_with_inventory
+  sqlcommand: |
+    SELECT ports.*, inventory.Site FROM ports
+    LEFT JOIN inventory ON removetxt(ports.Filename) = inventory.Hostname
+- type: sqljoin
+  db_name: bench
+  new_table: ports_with_vlans
+  first_table: ports
+  second_table: vlans
+  match: Filename
+  excel_export: none
+'''
+
+
+def generate_configs(folder, hosts, interfaces, vlans):
+    """ write synthetic device config files, return total bytes """
+    os.makedirs(folder, exist_ok=True)
+    total = 0
+    for h in range(hosts):
+        lines = [f'hostname router{h:05d}', '!']
+        for i in range(interfaces):
+            lines += [
+                f'interface GigabitEthernet0/0/{i}',
+                f' description link_to_peer_{h}_{i}',
+                f' ipv4 address 10.{h % 250}.{i % 250}.1 255.255.255.0',
+                ' mtu 9000',
+                ' no shutdown',
+                '!']
+        for v in range(vlans):
+            lines += [f'vlan {v + 100}', f' name vlan_desc_{v}', '!']
+        text = '\n'.join(lines) + '\n'
+        with open(os.path.join(folder, f'router{h:05d}.txt'), 'w',
+                  encoding='utf-8') as file:
+            file.write(text)
+        total += len(text)
+    return total
+
+
+def generate_inventory(excel_file, hosts):
+    """ write synthetic inventory excel file """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title='inventory')
+    ws.append(['Hostname', 'Site', 'Role'])
+    for h in range(hosts):
+        ws.append([f'router{h:05d}', f'site{h % 40}', 'pe'])
+    wb.save(excel_file)
+
+
+def peak_rss_mb():
+    """ peak rss of this process and children in MB (None on windows) """
+    if resource is None:
+        return None
+    usage = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # linux kilobytes, macOS bytes
+    return round(usage / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def table_rows(db, tables):
+    """ total row count of tables """
+    with sqlite3.connect(db) as con:
+        return sum(con.execute(f'select count(*) from {t}').fetchone()[0]
+                   for t in tables)
+
+
+def timed(stage, func, files=None, rows=None):
+    """ run func and return stage result dict, rows is callable for row count after run """
+    start = time.perf_counter()
+    func()
+    duration = time.perf_counter() - start
+    result = {'stage': stage, 'seconds': round(duration, 3),
+              'peak_rss_mb': peak_rss_mb()}
+    if files is not None:
+        result['files'] = files
+        result['files_per_sec'] = round(files / duration, 1) if duration else None
+    if rows is not None:
+        row_count = rows()
+        result['rows'] = row_count
+        result['rows_per_sec'] = round(row_count / duration, 1) if duration else None
+    return result
+
+
+def run(args):
+    """ generate input in temp folder and time each stage """
+    workdir = tempfile.mkdtemp(prefix='p2e_bench_')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        input_bytes = generate_configs(
+            'device_configs', args.hosts, args.interfaces, args.vlans)
+        generate_inventory('inventory.xlsx', args.hosts)
+        with open('config.yaml', 'w', encoding='utf-8') as file:
+            file.write(CONFIG.format(workers=args.workers))
+
+        timestamp = '_bench'
+        db = 'bench' + timestamp + '.sqlite3'
+        export_tables = {}
+        stages = [
+            timed('excel_run_yaml',
+                  lambda: Excel2Sql.excel_run_yaml('config.yaml', timestamp),
+                  rows=lambda: table_rows(db, ['inventory'])),
+            timed('textfsmv_run_yaml',
+                  lambda: Textfsmv.textfsmv_run_yaml(
+                      'config.yaml', timestamp, export_tables=export_tables),
+                  files=args.hosts * 2,
+                  rows=lambda: table_rows(db, ['ports', 'vlans'])),
+            timed('sqljoinv_run_yaml',
+                  lambda: Sqljoinv.sqljoinv_run_yaml(
+                      'config.yaml', timestamp, export_tables=export_tables),
+                  rows=lambda: table_rows(
+                      db, ['ports_with_inventory', 'ports_with_vlans'])),
+            timed('export_xlsx',
+                  lambda: Parsev.export_xlsx(export_tables),
+                  rows=lambda: table_rows(
+                      db, [t for i in export_tables.values() for t in i])),
+        ]
+        return {
+            'params': vars(args) | {'input_bytes': input_bytes},
+            'stages': stages,
+            'total_seconds': round(sum(i['seconds'] for i in stages), 3),
+            'output_bytes': {
+                i: os.path.getsize(i) for i in (db, 'bench' + timestamp + '.xlsx')
+                if os.path.exists(i)},
+        }
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(result, baseline, tolerance):
+    """ return regression messages, stage slower than baseline * (1 + tolerance) """
+    regressions = []
+    baseline_stages = {i['stage']: i for i in baseline['stages']}
+    for stage in result['stages']:
+        old = baseline_stages.get(stage['stage'])
+        if old and stage['seconds'] > old['seconds'] * (1 + tolerance):
+            regressions.append(
+                f"{stage['stage']}: {stage['seconds']}s > baseline {old['seconds']}s")
+    return regressions
+
+
+def main():
+    ''' benchmark cli '''
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hosts', type=int, default=500, help='synthetic host file count')
+    parser.add_argument('--interfaces', type=int, default=50, help='interfaces per host')
+    parser.add_argument('--vlans', type=int, default=20, help='vlans per host')
+    parser.add_argument('--workers', type=int, default=1, help='textfsm process count')
+    parser.add_argument('--output', help='write result json to file')
+    parser.add_argument('--baseline', help='compare with baseline json, exit 1 on regression')
+    parser.add_argument('--save-baseline', help='write result json as baseline file')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed slowdown ratio against baseline (default: 0.2)')
+    args = parser.parse_args()
+
+    result = run(argparse.Namespace(
+        hosts=args.hosts, interfaces=args.interfaces, vlans=args.vlans,
+        workers=args.workers))
+    text = json.dumps(result, indent=2)
+    print(text)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(text)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            regressions = compare(result, json.load(file), args.tolerance)
+        for i in regressions:
+            print(f'REGRESSION {i}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
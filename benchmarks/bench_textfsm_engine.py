@@ -0,0 +1,168 @@
+"""
+Differential check and benchmark of "engine: fast" (FastTextFSM) against stock textfsm.TextFSM,
+every template parses same texts with both engines, results must be identical (exit code 1 if not)
+
+usage:
+    python benchmarks/bench_textfsm_engine.py --hosts 200 --interfaces 50 --vlans 20 --output engine.json
+"""
+
+import argparse
+import io
+import json
+import random
+import sys
+import time
+
+import textfsm
+
+from parse2excel.fasttextfsm import FastTextFSM
+
+# README templates and templates with textfsm features (Continue, List, Filldown, EOF, back reference ...)
+TEMPLATES = {
+    'readme_interface': r'''Value Required Interface (\S+)
+Value Interface_Description (\S+)
+Value Interface_Ip (\S+)
+Value Interface_Mask (\S+)
+
+Start
+  ^interface ${Interface} -> Begin
+
+Begin
+  ^ description ${Interface_Description}
+  ^ ipv4 address ${Interface_Ip} ${Interface_Mask}
+  ^! -> Record Start
+''',
+    'readme_vlan': r'''Value Required Vlan_Number (\d+)
+Value Vlan_Desc_Name (\S+)
+
+Start
+  ^vlan ${Vlan_Number} -> Begin
+
+Begin
+  ^ name ${Vlan_Desc_Name}
+  ^! -> Record Start
+''',
+    'filldown_list_continue': r'''Value Filldown Hostname (\S+)
+Value Required Interface (\S+)
+Value List Options (\S+)
+Value Mtu (\d+)
+
+Start
+  ^hostname ${Hostname}
+  ^interface ${Interface} -> Continue
+  ^interface \S+/0/(\d+) -> Begin
+  ^interface -> Begin
+
+Begin
+  ^\s+(no )?${Options} -> Continue
+  ^ mtu ${Mtu}
+  ^!\s*$$ -> Record Start
+''',
+    'no_literal_prefix': r'''Value Word (\w+)
+Value Number (\d+)
+
+Start
+  ^\s*${Word}\s+${Number}\s*$$ -> Record
+  ^.*link_to_peer_${Number}_ -> Record
+''',
+    'back_reference_eof': r'''Value Ip (\d+\.\d+)
+Value Tail (\S+)
+
+Start
+  ^\s+ipv4 address ${Ip}\.(\d+)\.\1 ${Tail} -> Record
+  ^\s+ipv4 address ${Ip}\.\S+ ${Tail} -> Record
+  ^end -> EOF
+
+EOF
+''',
+    'clear_and_end': r'''Value Required Vlan (\d+)
+Value Name (\S+)
+
+Start
+  ^vlan ${Vlan}
+  ^ name ${Name} -> Record
+  ^ shutdown -> Clear
+  ^hostname router00003 -> End
+''',
+}
+
+# large template, 30 rules in Start state and most lines match none of them
+TEMPLATES['wide_30_rules'] = 'Value Key (\\S+)\nValue Hostname (\\S+)\n\nStart\n' + ''.join(
+    f'  ^feature{i} ${{Key}} -> Record\n' for i in range(28)) + (
+    '  ^hostname ${Hostname} -> Record\n'
+    '  ^ ipv4 address 10\\.1\\.${Key} -> Record\n')
+
+
+def generate_texts(hosts, interfaces, vlans, seed=1):
+    """ synthetic device config texts (some with shuffled lines) """
+    rnd = random.Random(seed)
+    texts = []
+    for h in range(hosts):
+        lines = [f'hostname router{h:05d}', '!']
+        for i in range(interfaces):
+            lines += [
+                f'interface GigabitEthernet0/0/{i}',
+                f' description link_to_peer_{h}_{i}',
+                f' ipv4 address 10.{h % 250}.{i % 250}.{i % 250} 255.255.255.0',
+                ' mtu 9000',
+                ' no shutdown' if i % 3 else ' shutdown',
+                '!']
+        for v in range(vlans):
+            lines += [f'vlan {v + 100}', f' name vlan_desc_{v}', '!']
+        lines.append('end')
+        if h % 5 == 4:
+            rnd.shuffle(lines)
+        texts.append('\n'.join(lines) + '\n')
+    return texts
+
+
+def parse_all(fsm_class, template, texts):
+    """ parse texts with one compiled fsm (reset for every text), return (results, seconds) """
+    fsm = fsm_class(io.StringIO(template))
+    results = []
+    start = time.perf_counter()
+    for text in texts:
+        fsm.Reset()
+        results.append(fsm.ParseText(text))
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hosts', type=int, default=200)
+    parser.add_argument('--interfaces', type=int, default=50)
+    parser.add_argument('--vlans', type=int, default=20)
+    parser.add_argument('--output', help='write result json to file')
+    args = parser.parse_args()
+
+    texts = generate_texts(args.hosts, args.interfaces, args.vlans)
+    result = {'hosts': args.hosts, 'bytes': sum(len(i) for i in texts), 'templates': {}}
+    different = []
+    for name, template in TEMPLATES.items():
+        stock, stock_seconds = parse_all(textfsm.TextFSM, template, texts)
+        fast, fast_seconds = parse_all(FastTextFSM, template, texts)
+        identical = stock == fast
+        if not identical:
+            different.append(name)
+        result['templates'][name] = {
+            'identical': identical,
+            'rows': sum(len(i) for i in stock),
+            'textfsm_seconds': round(stock_seconds, 4),
+            'fast_seconds': round(fast_seconds, 4),
+            'speedup': round(stock_seconds / fast_seconds, 2) if fast_seconds else None,
+        }
+    result['identical'] = not different
+
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(output)
+    if different:
+        print(f'DIFFERENT RESULT: {", ".join(different)}', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
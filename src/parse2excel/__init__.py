@@ -1 +1 @@
-from .parse2excel import Excel2Sql, Textfsmv, Sqljoinv
+from .parse2excel import Excel2Sql, Textfsmv, Sqljoinv, ConfigPlan, Pipeline
@@ -0,0 +1,76 @@
+"""
+TextFSM with line prefilter (textfsm part "engine: fast"), imported only when engine is used
+"""
+
+import re
+import textfsm
+
+
+class FastTextFSM(textfsm.TextFSM):
+    """ TextFSM with line prefilter, rules of every state are combined to one regex (literal prefixes checked first)
+    and lines matching no rule of current state are skipped before rule loop (stock TextFSM does nothing
+    for them), so result is same with textfsm.TextFSM """
+
+    # named group to non-capturing group, (?P=name) and numbered back references disable prefilter
+    NAMED_GROUP = re.compile(r'(?<!\\)\(\?P<\w+>')
+    BACK_REFERENCE = re.compile(r'\(\?P=|\\[1-9]')
+    REGEX_CHARS = set('.^$*+?{}[]|()\\')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._prefilters = {
+            name: FastTextFSM._state_prefilter(rules)
+            for name, rules in self.states.items()}
+
+    @staticmethod
+    def _literal_prefix(regex) -> str:
+        """ literal text every match starts with ('' if unknown) """
+        if '|' in regex:
+            return ''
+        regex = regex[1:] if regex.startswith('^') else regex
+        prefix = []
+        index = 0
+        while index < len(regex):
+            char = regex[index]
+            if char == '\\' and index + 1 < len(regex) and not regex[index + 1].isalnum():
+                char = regex[index + 1]
+                index += 2
+            elif char in FastTextFSM.REGEX_CHARS:
+                break
+            else:
+                index += 1
+            if index < len(regex) and regex[index] in '*?{':
+                # optional last char
+                break
+            prefix.append(char)
+        return ''.join(prefix)
+
+    @staticmethod
+    def _state_prefilter(rules):
+        """ function returning False for lines matching no rule (None if no prefilter possible) """
+        if not rules:
+            return lambda line: False
+        prefixes = tuple(FastTextFSM._literal_prefix(i.regex) for i in rules)
+        if not all(prefixes):
+            prefixes = None
+        combined = None
+        if not any(FastTextFSM.BACK_REFERENCE.search(i.regex) for i in rules):
+            try:
+                combined = re.compile('|'.join(
+                    '(?:' + FastTextFSM.NAMED_GROUP.sub('(?:', i.regex) + ')'
+                    for i in rules)).match
+            except re.error:
+                combined = None
+        if combined is None:
+            if prefixes is None:
+                return None
+            return lambda line: line.startswith(prefixes)
+        if prefixes is None:
+            return combined
+        return lambda line: line.startswith(prefixes) and combined(line) is not None
+
+    def _CheckLine(self, line):
+        prefilter = self._prefilters.get(self._cur_state_name)
+        if prefilter is not None and not prefilter(line):
+            return
+        super()._CheckLine(line)
@@ -4,34 +4,139 @@ Parsing text files with TextFSM and export to SQLite/Excel with configuration fi
 Version: 2022.09.01
 """
 
-import argparse
 import ast
+import cProfile
+import csv
+import gzip
+import hashlib
+import heapq
+import ipaddress
+import json
+import mmap
 import os
 import re
-import sqlite3
+import sys
+import threading
 import time
-from logging import info, warning, error, basicConfig, FileHandler, StreamHandler
+import weakref
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from fnmatch import fnmatch
+from functools import lru_cache
+from itertools import islice
+from logging import info, warning, error, basicConfig, getLogger, FileHandler, StreamHandler
 from io import StringIO
-from openpyxl.styles import Color, PatternFill
-from openpyxl import Workbook, load_workbook
-import textfsm
-import yaml
-
-# LOG OPTIONS
-basicConfig(
-    handlers=[
-        FileHandler('parse2excel_LOG.txt'),
-        StreamHandler()
-    ],
-    format='%(asctime)s.%(msecs)03d %(levelname)s : %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S',
-    level='INFO'
-)
+
+# openpyxl, textfsm, yaml and sqlite3 are imported in functions at first use (faster startup, no openpyxl without excel)
+
+
+def setup_logging(log_file='parse2excel_LOG.txt'):
+    ''' LOG OPTIONS, console and log file in working directory (called by main, library use keeps logging config) '''
+    basicConfig(
+        handlers=[
+            FileHandler(log_file),
+            StreamHandler()
+        ],
+        format='%(asctime)s.%(msecs)03d %(levelname)s : %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S',
+        level='INFO'
+    )
+
+
+def log_file_path():
+    ''' log file of root logger (set by setup_logging), None if not configured '''
+    for handler in getLogger().handlers:
+        if isinstance(handler, FileHandler):
+            return handler.baseFilename
+    return None
+
+
+class Metrics:
+    """ Run metrics: wall time, rows and bytes per (part, stage) and slowest host files, written as run report """
+    _stages = {}
+    _slowest_files = []
+    _start = time.perf_counter()
+    _lock = threading.Lock()
+    SLOWEST_FILES = 10
+
+    @staticmethod
+    def reset():
+        """ clear metrics for a new config run """
+        Metrics._stages = {}
+        Metrics._slowest_files = []
+        Metrics._start = time.perf_counter()
+
+    @staticmethod
+    def add(part, stage, seconds=0.0, rows=0, bytes_read=0, count=1):
+        """ add values to (part, stage) record """
+        with Metrics._lock:
+            record = Metrics._stages.setdefault(
+                (part, stage),
+                {'part': part, 'stage': stage, 'seconds': 0.0, 'count': 0,
+                 'rows': 0, 'bytes': 0})
+            record['seconds'] += seconds
+            record['count'] += count
+            record['rows'] += rows
+            record['bytes'] += bytes_read
+
+    @staticmethod
+    @contextmanager
+    def stage(part, stage):
+        """ time block as (part, stage) """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            Metrics.add(part, stage, seconds=time.perf_counter() - start)
+
+    @staticmethod
+    def add_file(part, path, seconds, bytes_read):
+        """ keep slowest host files """
+        item = (seconds, path, part, bytes_read)
+        with Metrics._lock:
+            if len(Metrics._slowest_files) < Metrics.SLOWEST_FILES:
+                heapq.heappush(Metrics._slowest_files, item)
+            else:
+                heapq.heappushpop(Metrics._slowest_files, item)
+
+    @staticmethod
+    def report() -> dict:
+        """ run report dict """
+        stages = []
+        for record in Metrics._stages.values():
+            record = dict(record, seconds=round(record['seconds'], 3))
+            stages.append(record)
+        return {
+            'total_seconds': round(time.perf_counter() - Metrics._start, 3),
+            'stages': stages,
+            'slowest_files': [
+                {'part': part, 'path': path, 'seconds': round(seconds, 3),
+                 'bytes': bytes_read}
+                for seconds, path, part, bytes_read in sorted(
+                    Metrics._slowest_files, reverse=True)],
+        }
+
+    @staticmethod
+    def write_report(file, config_file=''):
+        """ write run report to file.json and stages to file.csv """
+        report = dict({'config_file': config_file}, **Metrics.report())
+        with open(file + '.json', 'w', encoding='utf-8') as json_file:
+            json.dump(report, json_file, indent=2)
+        with open(file + '.csv', 'w', encoding='utf-8', newline='') as csv_file:
+            writer = csv.DictWriter(
+                csv_file, fieldnames=['part', 'stage', 'seconds', 'count', 'rows', 'bytes'])
+            writer.writeheader()
+            writer.writerows(report['stages'])
+        info(f'RUN REPORT <{file}.json> TOTAL {report["total_seconds"]}s')
 
 
 class Parsev:
     """ Class for general defs """
 
+    # data rows per excel sheet (1,048,576 rows with header)
+    EXCEL_MAX_ROWS = 1048575
+    EXPORT_FORMATS = ('xlsx', 'csv', 'csv.gz', 'parquet', 'arrow')
+
     # security problem for "exec" ! restrict import library !
     @staticmethod
     def text_to_exec(text):
@@ -51,6 +156,7 @@ class Parsev:
     def list_to_sql(input_list, headerlist, dbname, tablename='',
                     deletebeforedb=False, deletebeforetable=False):
         """ usage: list_to_sql([['mylist1','mylist2','mylist3']],['h1','h2','h3'],'testdb','testtable',True,True) """
+        import sqlite3
 
         if deletebeforedb is True:
             try:
@@ -71,19 +177,25 @@ class Parsev:
                 "'", "").replace(
                 " ", "")
 
-        q = "create table if not exists " + \
-            tablename+"("+str(headerlist)[1:-1]+")"
-        cur.execute(q)
+        cur.execute(Parsev.create_table_sql(headerlist, tablename))
 
         list_element_len = len(input_list[0])
         question_mark = ('?,' * list_element_len)[:-1]
         with con:
             q = "insert into " + tablename + " values (" + question_mark + ")"
             cur.executemany(q, input_list)
+        con.close()
+
+    @staticmethod
+    def create_table_sql(headerlist, tablename):
+        """ sqlite 'create table' command from header list (same table format with list_to_sql) """
+        return "create table if not exists " + \
+            tablename+"("+str(headerlist)[1:-1]+")"
 
     @staticmethod
     def dbtable_to_xlsx(db, table, file, sheetname, deletebefore=False):
         """ convert sqlite to excel file """
+        import sqlite3
         if deletebefore:
             try:
                 os.remove(file + '.xlsx')
@@ -99,6 +211,8 @@ class Parsev:
         headerslist = []
         headerslist = [headers[i][1] for i, h in enumerate(headers)]
 
+        from openpyxl import Workbook, load_workbook
+        from openpyxl.styles import Color, PatternFill
         if os.path.isfile(file + '.xlsx'):
             wb = load_workbook(filename=file + '.xlsx', data_only=True)
         else:
@@ -126,380 +240,2313 @@ class Parsev:
 
         wb.save(filename=file + '.xlsx')
 
+    @staticmethod
+    def _xlsx_sheet(wb, title, headerslist, header_fill):
+        """ new write_only sheet with frozen and filled header """
+        from openpyxl.cell import WriteOnlyCell
+        ws = wb.create_sheet(title=title)
+        ws.freeze_panes = 'A2'
+        # column width must be set before rows in write_only mode
+        for i in range(ord('A'), ord('Z') + 1):
+            ws.column_dimensions[chr(i)].width = 25.0
+        # style header fill
+        header_cells = []
+        for h in headerslist:
+            cell = WriteOnlyCell(ws, value=h)
+            cell.fill = header_fill
+            header_cells.append(cell)
+        ws.append(header_cells)
+        return ws
+
+    @staticmethod
+    def dbtables_to_xlsx(db, tables, file, chunk_size=10000, max_rows=None):
+        """ convert sqlite tables to excel file in one pass with write_only workbook,
+        tables is list of (table, sheetname), rows streamed from cursor with chunk_size,
+        tables bigger than max_rows (excel limit) continue in next sheets <sheetname>_2, <sheetname>_3 ... """
+        from openpyxl import Workbook
+        from openpyxl.styles import Color, PatternFill
+        from openpyxl.utils import get_column_letter
+        import sqlite3
+        max_rows = max_rows or Parsev.EXCEL_MAX_ROWS
+        wb = Workbook(write_only=True)
+        header_fill = PatternFill(patternType='solid', fgColor=Color('FFFF00'))
+        con = sqlite3.connect(db)
+        try:
+            for table, sheetname in tables:
+                try:
+                    start = time.perf_counter()
+                    cur = con.cursor()
+                    # header
+                    headers = cur.execute(
+                        'PRAGMA table_info(' + table + ')').fetchall()
+                    headerslist = [h[1] for h in headers]
+                    title = sheetname if sheetname != '' else f'{db}-{table}'
+                    sheet_titles = [title]
+                    ws = Parsev._xlsx_sheet(wb, title, headerslist, header_fill)
+                    # data values
+                    total_rows = 0
+                    sheet_rows = 0
+                    cur.execute('select * from ' + table)
+                    while True:
+                        rows = cur.fetchmany(chunk_size)
+                        if not rows:
+                            break
+                        for row in rows:
+                            if sheet_rows == max_rows:
+                                # add filter and continue in next sheet
+                                if headerslist:
+                                    ws.auto_filter.ref = f'A1:{get_column_letter(len(headerslist))}{sheet_rows + 1}'
+                                suffix = f'_{len(sheet_titles) + 1}'
+                                sheet_titles.append(title[:31 - len(suffix)] + suffix)
+                                ws = Parsev._xlsx_sheet(
+                                    wb, sheet_titles[-1], headerslist, header_fill)
+                                sheet_rows = 0
+                            ws.append(row)
+                            sheet_rows += 1
+                        total_rows += len(rows)
+                    Metrics.add(table, 'excel write',
+                                seconds=time.perf_counter() - start,
+                                rows=total_rows)
+                    # add filter
+                    if headerslist:
+                        ws.auto_filter.ref = f'A1:{get_column_letter(len(headerslist))}{sheet_rows + 1}'
+                    if len(sheet_titles) > 1:
+                        warning(
+                            f'[{table}] {total_rows} ROWS SPLIT TO EXCEL SHEETS {", ".join(sheet_titles)}')
+                    info(f'[{table}] / [{file}] EXCEL SHEET COMPLETED!')
+                except Exception as e:
+                    error(f'sql to excel problem @ {table} : {e}')
+        finally:
+            con.close()
+        wb.save(filename=file + '.xlsx')
+
+    @staticmethod
+    def dbtable_to_csv(db, table, file, compress=False, chunk_size=10000):
+        """ stream sqlite table to csv file (gzip compressed with compress) """
+        import sqlite3
+        start = time.perf_counter()
+        opener = gzip.open if compress else open
+        con = sqlite3.connect(db)
+        try:
+            cur = con.cursor()
+            headers = cur.execute('PRAGMA table_info(' + table + ')').fetchall()
+            row_count = 0
+            with opener(file, 'wt', newline='', encoding='utf-8') as csv_file:
+                writer = csv.writer(csv_file)
+                writer.writerow([h[1] for h in headers])
+                cur.execute('select * from ' + table)
+                while True:
+                    rows = cur.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    writer.writerows(rows)
+                    row_count += len(rows)
+        finally:
+            con.close()
+        Metrics.add(table, 'csv write', seconds=time.perf_counter() - start,
+                    rows=row_count)
+
+    @staticmethod
+    def dbtable_to_arrow(db, table, file, export_format='parquet',
+                         chunk_size=65536):
+        """ stream sqlite table to parquet or arrow ipc file with record batches of chunk_size rows,
+        column types from stored values of all rows (any text: string, any real: float64, only integer: int64),
+        columns with only NULL values from declared type (INT: int64, REAL/FLOA/DOUB: float64, others: string),
+        TEXT/CHAR/CLOB declared columns are string without scan, requires optional pyarrow package """
+        import sqlite3
+        try:
+            import pyarrow
+            import pyarrow.ipc
+            import pyarrow.parquet
+        except ImportError:
+            raise Exception(
+                f'pyarrow package required for {export_format} export (pip install pyarrow)')
+        start = time.perf_counter()
+        con = sqlite3.connect(db)
+        try:
+            cur = con.cursor()
+            headers = cur.execute('PRAGMA table_info(' + table + ')').fetchall()
+            # storage classes of not text columns in one scan, schema fits all rows (not only first batch)
+            scan = [
+                index for index, h in enumerate(headers)
+                if not any(i in (h[2] or '').upper() for i in ('CHAR', 'CLOB', 'TEXT'))]
+            storage = {}
+            if scan:
+                columns = ['"' + headers[i][1].replace('"', '""') + '"' for i in scan]
+                result = cur.execute('select ' + ', '.join(
+                    f"max(typeof({i}) in ('text', 'blob')), max(typeof({i}) = 'real'), "
+                    f"max(typeof({i}) = 'integer')" for i in columns) + ' from ' + table).fetchone()
+                for n, index in enumerate(scan):
+                    storage[index] = result[n * 3:n * 3 + 3]
+            fields = []
+            for index, h in enumerate(headers):
+                declared_type = (h[2] or '').upper()
+                has_text, has_real, has_integer = storage.get(index, (True, False, False))
+                if not (has_text or has_real or has_integer):
+                    # only NULL values
+                    has_real = any(i in declared_type for i in ('REAL', 'FLOA', 'DOUB'))
+                    has_integer = 'INT' in declared_type
+                    has_text = not (has_real or has_integer)
+                if has_text:
+                    fields.append((h[1], pyarrow.string()))
+                elif has_real:
+                    fields.append((h[1], pyarrow.float64()))
+                else:
+                    fields.append((h[1], pyarrow.int64()))
+            schema = pyarrow.schema(fields)
+            cur.execute('select * from ' + table)
+            rows = cur.fetchmany(chunk_size)
+            if export_format == 'parquet':
+                writer = pyarrow.parquet.ParquetWriter(file, schema)
+            else:
+                writer = pyarrow.ipc.new_file(file, schema)
+            row_count = 0
+            with writer:
+                while rows:
+                    arrays = []
+                    for index, field in enumerate(schema):
+                        values = [row[index] for row in rows]
+                        try:
+                            arrays.append(pyarrow.array(values, type=field.type))
+                        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+                            # numbers mixed with text in string column
+                            arrays.append(pyarrow.array(
+                                [ColumnTypes.to_text(i) for i in values],
+                                type=field.type))
+                    batch = pyarrow.record_batch(arrays, schema=schema)
+                    if export_format == 'parquet':
+                        writer.write_table(pyarrow.Table.from_batches([batch]))
+                    else:
+                        writer.write_batch(batch)
+                    row_count += len(rows)
+                    rows = cur.fetchmany(chunk_size)
+        finally:
+            con.close()
+        Metrics.add(table, f'{export_format} write',
+                    seconds=time.perf_counter() - start, rows=row_count)
+
+    @staticmethod
+    def export_formats(export_format) -> list:
+        """ export format list from comma separated text or list, e.g. 'xlsx,parquet' """
+        if isinstance(export_format, str):
+            export_format = export_format.split(',')
+        return [str(i).strip().lower() for i in export_format or []
+                if str(i).strip()]
+
+    @staticmethod
+    def export_entry(part, table):
+        """ export_tables entry of part table, (table, export_format) if part has export_format """
+        if 'export_format' in part:
+            return (table, part['export_format'])
+        return table
+
+    @staticmethod
+    def export(export_tables, export_format='xlsx'):
+        """ export tables, export_tables is dict {sql_dbname: [table or (table, export_format), ...]},
+        run export_format used for tables without own export_format,
+        xlsx: one excel file per db, csv / csv.gz / parquet / arrow: <sql_dbname>_<table>.<format> file per table """
+        for sql_dbname, tables in export_tables.items():
+            format_tables = {}
+            for table in tables:
+                table, table_format = table if isinstance(table, tuple) else (table, export_format)
+                for i in Parsev.export_formats(table_format):
+                    if table not in format_tables.setdefault(i, []):
+                        format_tables[i].append(table)
+            for table_format, tables in format_tables.items():
+                if table_format == 'xlsx':
+                    try:
+                        Parsev.dbtables_to_xlsx(
+                            sql_dbname + '.sqlite3', [(t, t) for t in tables],
+                            sql_dbname)
+                        info(f'[{sql_dbname}] EXCEL COMPLETED!')
+                    except Exception as e:
+                        error(f'sql to excel problem : {e}')
+                    continue
+                for table in tables:
+                    file = f'{sql_dbname}_{table}.{table_format}'
+                    try:
+                        if table_format in ('csv', 'csv.gz'):
+                            Parsev.dbtable_to_csv(
+                                sql_dbname + '.sqlite3', table, file,
+                                compress=table_format == 'csv.gz')
+                        elif table_format in ('parquet', 'arrow'):
+                            Parsev.dbtable_to_arrow(
+                                sql_dbname + '.sqlite3', table, file,
+                                table_format)
+                        else:
+                            raise Exception(
+                                f'export format must be one of {Parsev.EXPORT_FORMATS}')
+                        info(f'[{table}] / [{file}] EXPORT COMPLETED!')
+                    except Exception as e:
+                        error(f'sql to {table_format} problem @ {table} : {e}')
+
+    @staticmethod
+    def export_xlsx(export_tables):
+        """ write one excel file per db, export_tables is dict {sql_dbname: [table, ...]}
+        (tables with own export_format written with that format) """
+        Parsev.export(export_tables, 'xlsx')
+
+    @staticmethod
+    def yaml_text_to_list(yaml_text) -> list:
+        """ convert yaml text to list (first yaml document) with C accelerated safe loader if available """
+        import yaml
+        loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+        documents = list(yaml.load_all(yaml_text, Loader=loader))
+        return documents[0] if documents else []
+
     @staticmethod
     def yaml_file_to_list(yaml_file) -> list:
         """ convert yaml file to list"""
         with open(yaml_file, encoding='utf-8', errors='ignore') as file:
             yaml_text = file.read()
         try:
-            all_parts = list(yaml.full_load_all(yaml_text))[0]
-            return all_parts
+            return Parsev.yaml_text_to_list(yaml_text)
         except Exception as e:
             error(f'CHECK YAML FORMAT : {e}')
             return []
 
 
+class ConfigPlan:
+    """ Config file parsed once and validated, parts grouped by type for all stages
+
+    usage:
+        plan = ConfigPlan.load('config.yaml')
+        Textfsmv.textfsmv_run_yaml(plan, timestamp)
+    """
+
+    PART_TYPES = ('excel', 'textfsm', 'sqljoin', 'sqlfunction')
+
+    def __init__(self, parts, source=''):
+        self.source = source
+        self.parts = parts
+        self.excel = [i for i in parts if i['type'] == 'excel']
+        self.textfsm = [i for i in parts if i['type'] == 'textfsm']
+        self.sqljoin = [i for i in parts if i['type'] == 'sqljoin']
+        self.sqlfunction = [i for i in parts if i['type'] == 'sqlfunction']
+        self.function_registry = FunctionRegistry(self.sqlfunction)
+
+    @staticmethod
+    def load(yaml_file) -> 'ConfigPlan':
+        """ read, parse and validate config file, raise Exception with all problems """
+        with open(yaml_file, encoding='utf-8', errors='ignore') as file:
+            yaml_text = file.read()
+        try:
+            parts = Parsev.yaml_text_to_list(yaml_text)
+        except Exception as e:
+            error(f'CHECK YAML FORMAT : {e}')
+            raise Exception(f'CHECK YAML FORMAT @ <{yaml_file}> : {e}')
+        return ConfigPlan.from_parts(parts, yaml_file)
+
+    @staticmethod
+    def from_parts(parts, source='', require_files=True) -> 'ConfigPlan':
+        """ validate part list and return plan, raise Exception with all problems
+        (require_files False for textfsm parts without files/folders, e.g. Pipeline texts) """
+        problems = ConfigPlan.validate(parts, require_files)
+        for problem in problems:
+            error(f'CHECK CONFIG @ <{source}> : {problem}')
+        if problems:
+            raise Exception(
+                f'CHECK CONFIG @ <{source}> : {len(problems)} problem(s), first: {problems[0]}')
+        return ConfigPlan(parts, source)
+
+    @staticmethod
+    def from_config(config) -> 'ConfigPlan':
+        """ config is ConfigPlan or yaml file path """
+        if isinstance(config, ConfigPlan):
+            return config
+        return ConfigPlan.load(config)
+
+    @staticmethod
+    def _check_functions(functions, where) -> list:
+        if not isinstance(functions, list):
+            return [f'{where}: functions must be list']
+        return [
+            f'{where}: custom function not started with <def >'
+            for func in functions
+            if not isinstance(func, str) or not func.lstrip().startswith('def ')]
+
+    @staticmethod
+    def validate(parts, require_files=True) -> list:
+        """ return problem list for all parts (empty list for valid config) """
+        if not isinstance(parts, list):
+            return ['config must be list of parts']
+        problems = []
+        for index, part in enumerate(parts, start=1):
+            where = f'part {index}'
+            if not isinstance(part, dict) or part.get('type') not in ConfigPlan.PART_TYPES:
+                problems.append(f'{where}: type must be one of {ConfigPlan.PART_TYPES}')
+                continue
+            where = f'part {index} ({part["type"]})'
+            required = {
+                'excel': ('db_name', 'excel_file'),
+                'textfsm': ('db_name', 'table_name', 'template'),
+                'sqljoin': ('db_name',),
+                'sqlfunction': ('functions',),
+            }[part['type']]
+            if part['type'] == 'sqljoin':
+                if 'sqlcommand' in part:
+                    required += ('new_table',)
+                elif 'sqlcommand_run' not in part:
+                    required += ('first_table', 'second_table', 'match', 'new_table')
+            problems += [f'{where}: missing <{i}>' for i in required if i not in part]
+            if 'excel_export' in part and not isinstance(part['excel_export'], str):
+                problems.append(f'{where}: excel_export must be text (none)')
+            problems += [
+                f'{where}: export_format <{i}> must be one of {Parsev.EXPORT_FORMATS}'
+                for i in Parsev.export_formats(part.get('export_format'))
+                if i not in Parsev.EXPORT_FORMATS]
+            if 'functions' in part:
+                problems += ConfigPlan._check_functions(part['functions'], where)
+            for index in part.get('indexes', []):
+                try:
+                    Sqljoinv._parse_index(index)
+                except Exception as e:
+                    problems.append(f'{where}: check indexes : {e!r}')
+            if part['type'] == 'excel' and 'excel_file' in part and not os.path.isfile(part['excel_file']):
+                problems.append(f'{where}: excel file not found <{part["excel_file"]}>')
+            if part['type'] == 'textfsm':
+                if require_files and 'files' not in part and 'folders' not in part:
+                    problems.append(f'{where}: no files or folders')
+                schema = part.get('schema', {})
+                if not isinstance(schema, dict):
+                    problems.append(f'{where}: schema must be mapping (column: type)')
+                else:
+                    problems += [
+                        f'{where}: schema type of <{k}> must be one of {ColumnTypes.TYPES}'
+                        for k, v in schema.items() if str(v).upper() not in ColumnTypes.TYPES]
+                engine = str(part.get('engine', 'textfsm')).lower()
+                if engine not in TemplateCache.ENGINES:
+                    problems.append(f'{where}: engine must be one of {TemplateCache.ENGINES}')
+                elif 'template' in part:
+                    try:
+                        TemplateCache.get(part['template'], engine)
+                    except Exception as e:
+                        problems.append(f'{where}: check textfsm template : {e}')
+        return problems
+
+
+class ColumnTypes:
+    """ Typed columns for textfsm part "schema" (column: INTEGER / REAL / TEXT / IP),
+    values converted once per batch and "List" values stored as JSON arrays
+
+    usage:
+        types = ColumnTypes({'Vlan': 'INTEGER', 'Ip': 'IP'}, list_columns=['Members'])
+        with SqlLoader('testdb', column_types=types) as loader:
+            loader.add([['h1', '10', '10.0.0.1', ['1', '2']]], ['Filename', 'Vlan', 'Ip', 'Members'], 'testtable')
+    """
+
+    TYPES = ('INTEGER', 'REAL', 'TEXT', 'IP')
+
+    def __init__(self, schema=None, list_columns=(), strict=True):
+        """ schema: {column: type}, not declared columns are TEXT, list_columns: textfsm "List" values,
+        strict: create STRICT table if sqlite supports """
+        import sqlite3
+        self.schema = {k: str(v).upper() for k, v in (schema or {}).items()}
+        self.list_columns = set(list_columns)
+        # STRICT tables supported with sqlite >= 3.37
+        self.strict = bool(strict) and sqlite3.sqlite_version_info >= (3, 37, 0)
+        # column -> count of values not converted to INTEGER/REAL (stored as NULL)
+        self.invalid = {}
+
+    @staticmethod
+    def from_part(part, fsm):
+        """ ColumnTypes of textfsm part with "schema" (None without schema), fsm is compiled part template """
+        if 'schema' not in part:
+            return None
+        return ColumnTypes(
+            part['schema'],
+            list_columns=[i.name for i in fsm.values if 'List' in i.OptionNames()],
+            strict=part.get('strict', True))
+
+    @staticmethod
+    def to_integer(value):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def to_real(value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def to_text(value):
+        return None if value is None else str(value)
+
+    @staticmethod
+    def to_ip(value):
+        """ normalized ip address or interface (e.g. 10.0.0.1/24), not valid values kept as text """
+        try:
+            value = value.strip()
+            if not value:
+                return None
+            if '/' in value:
+                return str(ipaddress.ip_interface(value))
+            return str(ipaddress.ip_address(value))
+        except (AttributeError, ValueError):
+            return ColumnTypes.to_text(value)
+
+    def _number_converter(self, cast, column):
+        """ to_integer/to_real converter counting not converted values of column """
+        invalid = self.invalid
+
+        def to_number(value):
+            try:
+                return cast(value)
+            except (TypeError, ValueError):
+                if value not in (None, ''):
+                    invalid[column] = invalid.get(column, 0) + 1
+                return None
+        return to_number
+
+    def log_invalid(self, tablename):
+        """ warn and reset counts of values stored as NULL """
+        for column, count in self.invalid.items():
+            warning(f'[{tablename}] {count} VALUE(S) NOT {self.schema[column]} @ COLUMN {column}, STORED AS NULL!')
+        self.invalid.clear()
+
+    @staticmethod
+    def _list_converter(converter):
+        def to_json(value):
+            if isinstance(value, list):
+                return json.dumps([converter(i) for i in value])
+            return json.dumps([] if value in (None, '') else [converter(value)])
+        return to_json
+
+    def column_type(self, column) -> str:
+        """ sqlite column type, IP and list columns are TEXT """
+        column_type = self.schema.get(column, 'TEXT')
+        if column in self.list_columns or column_type == 'IP':
+            return 'TEXT'
+        return column_type
+
+    def converters(self, headerlist) -> list:
+        """ converter function for each column """
+        converters = []
+        for column in headerlist:
+            column_type = self.schema.get(column)
+            if column_type == 'INTEGER':
+                converter = self._number_converter(int, column)
+            elif column_type == 'REAL':
+                converter = self._number_converter(float, column)
+            elif column_type == 'IP':
+                converter = ColumnTypes.to_ip
+            else:
+                converter = ColumnTypes.to_text
+            if column in self.list_columns:
+                converter = ColumnTypes._list_converter(converter)
+            converters.append(converter)
+        return converters
+
+    @staticmethod
+    def convert(input_list, converters) -> list:
+        """ convert rows with column converters """
+        return [[conv(value) for conv, value in zip(converters, row)]
+                for row in input_list]
+
+    def create_table_sql(self, headerlist, tablename) -> str:
+        columns = ', '.join(
+            '"' + str(i).replace('"', '""') + '" ' + self.column_type(i)
+            for i in headerlist)
+        return ("create table if not exists " + tablename + "(" + columns + ")"
+                + (" STRICT" if self.strict else ""))
+
+
+class SqlLoader:
+    """ Bulk loader with single sqlite connection and transaction for a whole part
+
+    usage:
+        with SqlLoader('testdb', batch_size=50000) as loader:
+            loader.add([['mylist1','mylist2']], ['h1','h2'], 'testtable')
+    """
+
+    # pragma values for "bulk_load" option, journal_mode is changed with bulk_load value (true=OFF, wal=WAL)
+    BULK_PRAGMAS = ('PRAGMA synchronous = OFF', 'PRAGMA cache_size = -200000',
+                    'PRAGMA temp_store = MEMORY')
+
+    def __init__(self, dbname, batch_size=50000, commit_interval=0,
+                 bulk_load=False, column_types=None, con=None):
+        """ batch_size: rows per executemany, commit_interval: rows per commit (0 for single commit at close),
+        bulk_load: false / true (journal_mode=OFF) / 'wal' / 'off',
+        column_types: ColumnTypes for typed tables (None for untyped table and values as given),
+        con: open sqlite connection to use (committed but not closed at close, dbname only for log) """
+        import sqlite3
+        self.dbname = dbname
+        self.column_types = column_types
+        self.batch_size = max(1, int(batch_size))
+        self.commit_interval = int(commit_interval)
+        self._own_con = con is None
+        self.con = sqlite3.connect(dbname + '.sqlite3') if con is None else con
+        self.cur = self.con.cursor()
+        if bulk_load:
+            journal_mode = 'OFF' if bulk_load is True else str(bulk_load).upper()
+            self.cur.execute(f'PRAGMA journal_mode = {journal_mode}')
+            for pragma in SqlLoader.BULK_PRAGMAS:
+                self.cur.execute(pragma)
+        # tablename -> insert command, pending rows
+        self._tables = {}
+        self._pending = {}
+        self._converters = {}
+        # tablename -> rows added (with pending rows), max rowid before first insert of loader
+        self.added = {}
+        self._rowid_base = {}
+        self._uncommitted = 0
+        self.rows = 0
+        self.insert_seconds = 0.0
+        self._start = time.perf_counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add(self, input_list, headerlist, tablename):
+        """ add rows to table, table created at first add and rows inserted when batch_size reached """
+        if not input_list:
+            return
+        self.create_table(headerlist, tablename)
+        pending = self._pending[tablename]
+        if tablename in self._converters:
+            input_list = ColumnTypes.convert(
+                input_list, self._converters[tablename])
+        pending.extend(input_list)
+        self.added[tablename] = self.added.get(tablename, 0) + len(input_list)
+        if len(pending) >= self.batch_size:
+            self._flush_table(tablename)
+
+    def create_table(self, headerlist, tablename):
+        """ create table if not created before by this loader """
+        if tablename in self._tables:
+            return
+        if self.column_types is None:
+            self.cur.execute(Parsev.create_table_sql(headerlist, tablename))
+        else:
+            self.cur.execute(
+                self.column_types.create_table_sql(headerlist, tablename))
+            self._converters[tablename] = self.column_types.converters(
+                headerlist)
+        question_mark = ('?,' * len(headerlist))[:-1]
+        self._tables[tablename] = "insert into " + \
+            tablename + " values (" + question_mark + ")"
+        self._pending[tablename] = []
+
+    def _flush_table(self, tablename):
+        pending = self._pending[tablename]
+        if not pending:
+            return
+        start = time.perf_counter()
+        if tablename not in self._rowid_base:
+            self._rowid_base[tablename] = self.cur.execute(
+                f'select coalesce(max(rowid), 0) from {tablename}').fetchone()[0]
+        self.cur.executemany(self._tables[tablename], pending)
+        self.insert_seconds += time.perf_counter() - start
+        self.rows += len(pending)
+        self._uncommitted += len(pending)
+        self._pending[tablename] = []
+        if self.commit_interval and self._uncommitted >= self.commit_interval:
+            self.commit()
+
+    def rowid(self, tablename, position) -> int:
+        """ rowid of inserted row at position (1 for first row added to table by loader),
+        sqlite gives max(rowid) + 1 to every new row and loader not deletes rows """
+        return self._rowid_base.get(tablename, 0) + position
+
+    def flush(self):
+        """ insert all pending rows """
+        for tablename in self._pending:
+            self._flush_table(tablename)
+
+    def commit(self):
+        """ insert pending rows and commit transaction """
+        self.flush()
+        start = time.perf_counter()
+        self.con.commit()
+        self.insert_seconds += time.perf_counter() - start
+        self._uncommitted = 0
+
+    def close(self):
+        """ commit, close connection (if opened by loader) and log rows/sec """
+        if self.con is None:
+            return
+        try:
+            self.commit()
+        finally:
+            if self._own_con:
+                self.con.close()
+            self.con = None
+        duration = time.perf_counter() - self._start
+        rate = self.rows / duration if duration > 0 else 0
+        info(f'[{self.dbname}] {self.rows} ROWS LOADED IN {duration:.2f}s ({rate:.0f} rows/sec)')
+        if self.column_types is not None:
+            self.column_types.log_invalid(', '.join(self._tables))
+
+
+class TemplateCache:
+    """ Compiled textfsm template cache keyed by template content hash, FSM reused with Reset()
+    (one FSM per thread, so parts can run in parallel threads) """
+    ENGINES = ('textfsm', 'fast')
+    _local = threading.local()
+    _lock = threading.Lock()
+    hits = 0
+    misses = 0
+
+    @staticmethod
+    def key(textfsm_template) -> str:
+        """ template content hash """
+        return hashlib.sha1(textfsm_template.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _thread_cache() -> dict:
+        cache = getattr(TemplateCache._local, 'cache', None)
+        if cache is None:
+            cache = TemplateCache._local.cache = {}
+        return cache
+
+    @staticmethod
+    def engine_class(engine):
+        """ fsm class of engine, textfsm imported at first use """
+        if engine == 'fast':
+            from .fasttextfsm import FastTextFSM
+            return FastTextFSM
+        if engine == 'textfsm':
+            import textfsm
+            return textfsm.TextFSM
+        raise ValueError(f'engine must be one of {TemplateCache.ENGINES}')
+
+    @staticmethod
+    def get(textfsm_template, engine='textfsm'):
+        """ return compiled and reset FSM for template text, engine is 'textfsm' (textfsm.TextFSM)
+        or 'fast' (fasttextfsm.FastTextFSM with line prefilter) """
+        key = (TemplateCache.key(textfsm_template), engine)
+        cache = TemplateCache._thread_cache()
+        fsm = cache.get(key)
+        if fsm is None:
+            fsm = TemplateCache.engine_class(engine)(StringIO(textfsm_template))
+            cache[key] = fsm
+            with TemplateCache._lock:
+                TemplateCache.misses += 1
+        else:
+            fsm.Reset()
+            with TemplateCache._lock:
+                TemplateCache.hits += 1
+        return fsm
+
+    @staticmethod
+    def drain() -> tuple:
+        """ return and reset (hits, misses) counters, process pool workers send them to main process """
+        with TemplateCache._lock:
+            counts = (TemplateCache.hits, TemplateCache.misses)
+            TemplateCache.hits = TemplateCache.misses = 0
+        return counts
+
+    @staticmethod
+    def add_counts(counts):
+        """ add (hits, misses) counters of process pool worker """
+        with TemplateCache._lock:
+            TemplateCache.hits += counts[0]
+            TemplateCache.misses += counts[1]
+
+    @staticmethod
+    def stats() -> str:
+        """ hit/miss counters for log (with process pool workers), size of calling thread cache """
+        return f'TEMPLATE CACHE hits={TemplateCache.hits} misses={TemplateCache.misses} size={len(TemplateCache._thread_cache())}'
+
+
+class Manifest:
+    """ Content-hash manifest of parsed host files for incremental textfsm runs, rowid range of every file rows
+    (file names are not unique) and own scope for every part writing same table """
+
+    TABLE = 'p2e_manifest'
+    COLUMNS = ('table_name', 'scope', 'path', 'filename', 'size', 'mtime', 'content_hash',
+               'template_hash', 'first_rowid', 'last_rowid')
+
+    @staticmethod
+    def scopes(keys) -> list:
+        """ (scope, scope count) for every (db, table) key in part order, parts writing same table have own scope """
+        counts, scopes = {}, []
+        for key in keys:
+            scopes.append(counts.get(key, 0))
+            counts[key] = scopes[-1] + 1
+        return [(scope, counts[key]) for scope, key in zip(scopes, keys)]
+
+    @staticmethod
+    def file_hash(path, chunk_size=1 << 20) -> str:
+        """ sha1 of file content, read in chunks """
+        file_sha1 = hashlib.sha1()
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(chunk_size), b''):
+                file_sha1.update(chunk)
+        return file_sha1.hexdigest()
+
+    @staticmethod
+    def changed_host_files(con, table_name, host_files, template_hash, scope=0, scopes=1):
+        """ compare host_files with manifest of part scope, delete rows of changed and removed files
+        (and rows of scopes >= scopes, removed parts) from table,
+        return (changed host_files, manifest rows for changed files without rowid range,
+        manifest rows for only mtime changed files) """
+        cur = con.cursor()
+        Manifest.create(cur)
+        table_exists = cur.execute(
+            "select 1 from sqlite_master where type = 'table' and name = ?",
+            (table_name,)).fetchone() is not None
+        max_rowid = cur.execute(
+            f'select max(last_rowid) from {Manifest.TABLE} where table_name = ?',
+            (table_name,)).fetchone()[0]
+
+        # table/manifest out of sync, parse all files of all parts again
+        if table_exists != (max_rowid is not None):
+            info(f'[{table_name}] NO MANIFEST, ALL FILES PARSED!')
+            cur.execute(f'drop table if exists {table_name}')
+            cur.execute(
+                f'delete from {Manifest.TABLE} where table_name = ?', (table_name,))
+            table_exists = False
+        elif table_exists:
+            # rows committed after last manifest row (interrupted run) deleted, files parsed again
+            cur.execute(f'delete from {table_name} where rowid > ?', (max_rowid,))
+
+        delete_ranges = []
+        # parts removed from config
+        for row in cur.execute(
+                f'select first_rowid, last_rowid from {Manifest.TABLE} '
+                f'where table_name = ? and scope >= ?', (table_name, scopes)).fetchall():
+            delete_ranges.append(row)
+        cur.execute(
+            f'delete from {Manifest.TABLE} where table_name = ? and scope >= ?',
+            (table_name, scopes))
+        manifest = {
+            row[0]: row[1:] for row in cur.execute(
+                f'select path, size, mtime, content_hash, template_hash, first_rowid, last_rowid '
+                f'from {Manifest.TABLE} where table_name = ? and scope = ?', (table_name, scope))}
+        # template changed, parse all files of part again
+        if any(i[3] != template_hash for i in manifest.values()):
+            info(f'[{table_name}] TEMPLATE CHANGED, ALL FILES PARSED!')
+            delete_ranges.extend(i[4:] for i in manifest.values())
+            cur.execute(
+                f'delete from {Manifest.TABLE} where table_name = ? and scope = ?',
+                (table_name, scope))
+            manifest = {}
+
+        changed, changed_rows, touched_rows = [], [], []
+        current = set()
+        for host_path, host in host_files:
+            current.add(host_path)
+            stat = os.stat(host_path)
+            old = manifest.get(host_path)
+            if old and old[0] == stat.st_size and old[1] == stat.st_mtime:
+                continue
+            content_hash = Manifest.file_hash(host_path)
+            row = (table_name, scope, host_path, host, stat.st_size, stat.st_mtime,
+                   content_hash, template_hash)
+            if old and old[2] == content_hash:
+                touched_rows.append(row + old[4:])
+                continue
+            if old:
+                delete_ranges.append(old[4:])
+            changed.append((host_path, host))
+            changed_rows.append(row)
+
+        removed = [i for i in manifest if i not in current]
+        for host_path in removed:
+            delete_ranges.append(manifest[host_path][4:])
+        if table_exists:
+            cur.executemany(
+                f'delete from {table_name} where rowid between ? and ?',
+                delete_ranges)
+        cur.executemany(
+            f'delete from {Manifest.TABLE} where table_name = ? and scope = ? and path = ?',
+            [(table_name, scope, i) for i in removed])
+        info(f'[{table_name}] INCREMENTAL: {len(changed)} CHANGED, '
+             f'{len(host_files) - len(changed)} UNCHANGED, {len(removed)} REMOVED FILES')
+        return changed, changed_rows, touched_rows
+
+    @staticmethod
+    def create(cur):
+        """ create manifest table if not exists, manifest of older version (without rowid range) dropped """
+        columns = [i[1] for i in cur.execute(f'PRAGMA table_info({Manifest.TABLE})')]
+        if columns and tuple(columns) != Manifest.COLUMNS:
+            cur.execute(f'drop table {Manifest.TABLE}')
+        cur.execute(
+            f'create table if not exists {Manifest.TABLE} '
+            '(table_name TEXT, scope INTEGER, path TEXT, filename TEXT, size INTEGER, mtime REAL, '
+            'content_hash TEXT, template_hash TEXT, first_rowid INTEGER, last_rowid INTEGER, '
+            'PRIMARY KEY (table_name, scope, path))')
+
+    @staticmethod
+    def save(con, rows):
+        """ insert or replace manifest rows """
+        con.executemany(
+            f'insert or replace into {Manifest.TABLE} values (?,?,?,?,?,?,?,?,?,?)',
+            rows)
+
+
+class Checkpoint:
+    """ Completed parts of every run in db (parsed file batches of textfsm parts are saved to manifest),
+    "--resume <db>" continues run of db without completed parts and parsed files """
+
+    TABLE = 'p2e_checkpoint'
+
+    @staticmethod
+    def key(part) -> str:
+        """ sha1 of part content """
+        return hashlib.sha1(
+            json.dumps(part, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def save(con, part, name):
+        """ mark part completed, committed with part result """
+        con.execute(
+            f'create table if not exists {Checkpoint.TABLE} '
+            '(part_key TEXT PRIMARY KEY, part_type TEXT, name TEXT, completed TEXT)')
+        con.execute(
+            f'insert or replace into {Checkpoint.TABLE} values (?,?,?,?)',
+            (Checkpoint.key(part), part['type'], name,
+             time.strftime('%Y-%m-%d %H:%M:%S')))
+
+    @staticmethod
+    def completed(sql_dbname) -> set:
+        """ part keys completed in db """
+        import sqlite3
+        if not os.path.exists(sql_dbname + '.sqlite3'):
+            return set()
+        con = sqlite3.connect(sql_dbname + '.sqlite3')
+        try:
+            return {i[0] for i in con.execute(f'select part_key from {Checkpoint.TABLE}')}
+        except sqlite3.OperationalError:
+            # no checkpoint table
+            return set()
+        finally:
+            con.close()
+
+    @staticmethod
+    def reset(sql_dbnames):
+        """ delete checkpoints of earlier runs from existing (stable) dbs """
+        import sqlite3
+        for sql_dbname in sql_dbnames:
+            if not os.path.exists(sql_dbname + '.sqlite3'):
+                continue
+            con = sqlite3.connect(sql_dbname + '.sqlite3')
+            try:
+                con.execute(f'drop table if exists {Checkpoint.TABLE}')
+                con.commit()
+            finally:
+                con.close()
+
+    @staticmethod
+    def resume_timestamp(sql_db) -> str:
+        """ timestamp of db name or file (e.g. my_p2e_excel_20261017-120000.sqlite3), '' for stable db """
+        if not sql_db.endswith('.sqlite3'):
+            sql_db += '.sqlite3'
+        if not os.path.exists(sql_db):
+            error(f'resume db not found : {sql_db}')
+            raise Exception(f'resume db not found : {sql_db}')
+        match = re.search(r'_\d{8}-\d{6}$', os.path.basename(sql_db)[:-len('.sqlite3')])
+        return match.group(0) if match else ''
+
+
 class Textfsmv:
     """ Textfsm based class """
 
+    @staticmethod
+    def _textfsm_result(output, textfsm_template, host='', engine='textfsm'):
+        """ textfsm_result with hostname, template errors raised (e.g. textfsm.TextFSMError) """
+        fsm = TemplateCache.get(textfsm_template, engine)
+        fsm_result = fsm.ParseText(output)
+        return [['Filename'] + fsm.header] + [[host] + i for i in fsm_result]
+
     @staticmethod
     def _textfsm_result_with_host(
-            output, textfsm_template, host='', isfile=False):
+            output, textfsm_template, host='', isfile=False, engine='textfsm'):
         """textfsm_result with hostname"""
         if isfile:
-            template = open(textfsm_template)
-            fsm_result = textfsm.TextFSM(template).ParseText(output)
+            import textfsm
+            with open(textfsm_template) as template:
+                fsm = textfsm.TextFSM(template)
+            return [['Filename'] + fsm.header] + [[host] + i for i in fsm.ParseText(output)]
         else:
             try:
-                template = StringIO(textfsm_template)
-                fsm_result_header = textfsm.TextFSM(template).header
-                fsm_result = textfsm.TextFSM(template).ParseText(output)
-                fsm_result_host = [[host]+i for i in fsm_result]
-                result = [['Filename'] + fsm_result_header] + fsm_result_host
-                return result
+                return Textfsmv._textfsm_result(
+                    output, textfsm_template, host, engine)
             except Exception as e:
                 error(f'check textfsm template : {e}')
                 raise SystemExit
 
     @staticmethod
-    def textfsmv_run_yaml(yaml_file, timestamp, excel_export=True):
-        """run with textfsm yaml file"""
-        all_parts = [i for i in Parsev.yaml_file_to_list(
-            yaml_file) if i['type'] == 'textfsm']
+    def _parse_host_file(host_path, textfsm_template, host, engine='textfsm'):
+        """read host file and return (textfsm_result with hostname, read seconds, parse seconds, bytes read),
+        textfsm_result is None if file can not be read or parsed (process pool worker)"""
+        start = time.perf_counter()
+        try:
+            with open(host_path, encoding='utf-8', errors='ignore') as file:
+                host_file_text = file.read()
+            read_end = time.perf_counter()
+            result = Textfsmv._textfsm_result_with_host(
+                host_file_text, textfsm_template, host, engine=engine)
+        except (Exception, SystemExit) as e:
+            # single bad file does not stop other files of part
+            error(f'host file problem @ {host_path} : {e!r}')
+            return (None, time.perf_counter() - start, 0.0, 0)
+        return (result, read_end - start, time.perf_counter() - read_end,
+                len(host_file_text))
+
+    @staticmethod
+    def _init_pool_worker(textfsm_template, engine='textfsm', log_file=None):
+        """ process pool initializer, logging to log file of main process, counters copied from main process reset
+        and template compiled once """
+        if log_file:
+            setup_logging(log_file)
+        TemplateCache.drain()
+        TemplateCache.get(textfsm_template, engine)
 
-        for part in all_parts:
-            excel_export = True
-            # textfsm template from yaml
-            textfsm_input = part['template']
-            # db name from yaml
-            sql_dbname = part['db_name'] + timestamp
-            # table name from yaml AND replace some chars
-            table_name = part['table_name'].replace('.', '_').replace('-', '_')
-            if 'excel_export' in part:
-                if part['excel_export'].lower() == 'none':
-                    excel_export = False
+    @staticmethod
+    def _pool_parse_host_file(host_path, textfsm_template, host, engine='textfsm'):
+        """ _parse_host_file in process pool worker, return (_parse_host_file result, worker cache counters) """
+        return (Textfsmv._parse_host_file(host_path, textfsm_template, host, engine),
+                TemplateCache.drain())
+
+    @staticmethod
+    def _iter_text_chunks(host_path, chunk_lines=10000, use_mmap=False):
+        """ yield text of every chunk_lines lines of host file, read line by line or from memory-mapped buffer """
+        if use_mmap:
+            with open(host_path, 'rb') as file:
+                if os.fstat(file.fileno()).st_size == 0:
+                    return
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                    lines_iter = iter(buffer.readline, b'')
+                    while True:
+                        lines = list(islice(lines_iter, chunk_lines))
+                        if not lines:
+                            return
+                        yield b''.join(lines).decode('utf-8', errors='ignore')
+        else:
+            with open(host_path, encoding='utf-8', errors='ignore') as file:
+                while True:
+                    lines = list(islice(file, chunk_lines))
+                    if not lines:
+                        return
+                    yield ''.join(lines)
+
+    @staticmethod
+    def _stream_host_file(host_path, textfsm_template, host, chunk_lines=10000,
+                          use_mmap=False, engine='textfsm'):
+        """ yield textfsm record batches with hostname for large host file, memory bound by chunk_lines
+        (same records with TextFSM.ParseText for whole file if template has no Fillup value,
+        Fillup can not fill records of yielded chunks) """
+        fsm = TemplateCache.get(textfsm_template, engine)
+        for text in Textfsmv._iter_text_chunks(host_path, chunk_lines, use_mmap):
+            records = fsm.ParseText(text, eof=False)
+            if records:
+                yield [[host] + i for i in records]
+                # records is fsm result list, clear for next chunk
+                del records[:]
+            # ParseText stops at End/EOF state, so skip other chunks
+            if fsm._cur_state_name in ('End', 'EOF'):
+                break
+        # implicit EOF record
+        records = fsm.ParseText('', eof=True)
+        if records:
+            yield [[host] + i for i in records]
+
+    @staticmethod
+    def _parse_host_files(host_files, textfsm_template, workers=1,
+                          large_files=(), engine='textfsm'):
+        """ yield _parse_host_file result for each (host_path, host) in host_files order, workers > 1 parse in process pool
+        (at most workers * 4 files in flight), None is yielded for large_files paths (streamed by caller) """
+        if workers == 0:
+            workers = os.cpu_count() or 1
+        pool_files = [i for i in host_files if i[0] not in large_files]
+        if workers < 2 or len(pool_files) < 2:
+            for host_path, host in host_files:
+                if host_path in large_files:
+                    yield None
+                else:
+                    yield Textfsmv._parse_host_file(
+                        host_path, textfsm_template, host, engine)
+            return
+        import multiprocessing
+        from collections import deque
+        from concurrent.futures import ProcessPoolExecutor
+        # pool is created in part threads (--jobs), fork with other threads holding locks (e.g. logging) can deadlock
+        start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        # compile template once in every worker process
+        with ProcessPoolExecutor(
+                max_workers=workers, initializer=Textfsmv._init_pool_worker,
+                initargs=(textfsm_template, engine, log_file_path()),
+                mp_context=multiprocessing.get_context(start_method)) as executor:
+            # one file per task submitted in host_files order, sliding window bounds results buffered in memory,
+            # results yielded in host_files order, so rows land in same order for any workers count
+            window = workers * 4
+            futures = deque()
+            for host_path, host in host_files:
+                if host_path in large_files:
+                    futures.append(None)
+                else:
+                    futures.append(executor.submit(
+                        Textfsmv._pool_parse_host_file, host_path,
+                        textfsm_template, host, engine))
+                while len(futures) > window or (futures and futures[0] is None):
+                    yield from Textfsmv._pool_result(futures.popleft())
+            while futures:
+                yield from Textfsmv._pool_result(futures.popleft())
+
+    @staticmethod
+    def _pool_result(future):
+        """ yield parse result of pool future (None for large file), merge worker template cache counts """
+        if future is None:
+            yield None
+            return
+        parse_result, counts = future.result()
+        TemplateCache.add_counts(counts)
+        yield parse_result
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _glob_regex(pattern):
+        """ compile glob path pattern, '*' and '?' not match '/', '**/' matches zero or more folders """
+        regex = ''
+        i = 0
+        while i < len(pattern):
+            if pattern.startswith('**/', i):
+                regex += '(?:.*/)?'
+                i += 3
+            elif pattern.startswith('**', i):
+                regex += '.*'
+                i += 2
+            elif pattern[i] == '*':
+                regex += '[^/]*'
+                i += 1
+            elif pattern[i] == '?':
+                regex += '[^/]'
+                i += 1
+            elif pattern[i] == '[' and pattern.find(']', i + 1) != -1:
+                end = pattern.find(']', i + 1)
+                chars = pattern[i + 1:end]
+                if chars.startswith('!'):
+                    chars = '^' + chars[1:]
+                regex += '[' + chars.replace('\\', '\\\\') + ']'
+                i = end + 1
+            else:
+                regex += re.escape(pattern[i])
+                i += 1
+        return re.compile(regex + r'\Z')
+
+    @staticmethod
+    def _match_patterns(rel_path, patterns) -> bool:
+        """ glob patterns, pattern with '/' matched with relative path else with file name """
+        name = rel_path.rsplit('/', 1)[-1]
+        for pattern in patterns:
+            if '/' in pattern:
+                if Textfsmv._glob_regex(pattern).match(rel_path):
+                    return True
+            elif fnmatch(name, pattern):
+                return True
+        return False
+
+    @staticmethod
+    def _scan_folder(folder, recursive=False, include=None, exclude=None,
+                     max_size=None):
+        """ yield (path, path relative to folder, size) for files in folder with os.scandir, sorted by path in every folder
+        (relative path is file name if not recursive), include/exclude are fnmatch pattern lists,
+        files bigger than max_size bytes skipped """
+        stack = [(folder, '')]
+        while stack:
+            current, rel_folder = stack.pop()
+            with os.scandir(current) as entries:
+                entries = sorted(entries, key=lambda i: i.name)
+            sub_folders = []
+            for entry in entries:
+                rel_path = rel_folder + entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive and not (exclude and Textfsmv._match_patterns(rel_path, exclude)):
+                        sub_folders.append((entry.path, rel_path + '/'))
+                    continue
+                if not entry.is_file():
+                    continue
+                if include and not Textfsmv._match_patterns(rel_path, include):
+                    continue
+                if exclude and Textfsmv._match_patterns(rel_path, exclude):
+                    continue
+                size = entry.stat().st_size
+                if max_size is not None and size > max_size:
+                    warning(f'file skipped, bigger than max_file_mb @ {entry.path}')
+                    continue
+                # relative path as host, same file name in sub folders is different host
+                yield entry.path, rel_path, size
+            # depth first in name order
+            stack.extend(reversed(sub_folders))
 
-            # for single hosts, yaml:files
-            if 'files' in part:
-                for host_file in part['files']:
-                    with open(host_file, encoding='utf-8', errors='ignore') as file:
-                        host_file_text = file.read()
-                    # textfsm_result to sqlite
-                    single_textfsm_result = Textfsmv._textfsm_result_with_host(
-                        host_file_text, textfsm_input, host_file.split('/')[-1])
+    @staticmethod
+    def _folder_spec(folder, part) -> dict:
+        """ folders entry (folder path, glob pattern like 'archive/**/*.txt' or dict) to _scan_folder kwargs,
+        part keys recursive/include/exclude/max_file_mb are defaults """
+        spec = {
+            'recursive': bool(part.get('recursive', False)),
+            'include': part.get('include'),
+            'exclude': part.get('exclude'),
+            'max_file_mb': part.get('max_file_mb'),
+        }
+        if isinstance(folder, dict):
+            spec.update({k: v for k, v in folder.items() if k != 'path'})
+            folder = folder['path']
+        elif any(i in folder for i in '*?['):
+            # split glob to base folder and pattern
+            parts = folder.replace('\\', '/').split('/')
+            base = []
+            while parts and not any(i in parts[0] for i in '*?['):
+                base.append(parts.pop(0))
+            pattern = '/'.join(parts)
+            folder = '/'.join(base) or '.'
+            spec['include'] = [pattern]
+            spec['recursive'] = '/' in pattern
+        for key in ('include', 'exclude'):
+            if isinstance(spec[key], str):
+                spec[key] = [spec[key]]
+        max_file_mb = spec.pop('max_file_mb')
+        spec['max_size'] = None if max_file_mb is None else float(
+            max_file_mb) * 1024 * 1024
+        spec['folder'] = folder.rstrip('/') or '/'
+        return spec
+
+    @staticmethod
+    def _host_files_from_part(part):
+        """ return ([(host file path, host)], {host file path: size}) from yaml:files and yaml:folders """
+        host_files = []
+        file_sizes = {}
+        for host_file in part.get('files', []):
+            try:
+                file_sizes[host_file] = os.path.getsize(host_file)
+            except OSError as e:
+                error(f'host file problem : {e}')
+                continue
+            host_files.append((host_file, host_file.split('/')[-1]))
+        for folder in part.get('folders', []):
+            spec = Textfsmv._folder_spec(folder, part)
+            try:
+                for host_path, host, size in Textfsmv._scan_folder(**spec):
+                    if host_path not in file_sizes:
+                        host_files.append((host_path, host))
+                    file_sizes[host_path] = size
+            except OSError as e:
+                error(f'host folder problem : {e}')
+        return host_files, file_sizes
+
+    @staticmethod
+    def _load_large_host_file(loader, host_path, textfsm_template, host,
+                              table_name, use_mmap=False, engine='textfsm'):
+        """ stream large host file records to loader """
+        start = time.perf_counter()
+        header = ['Filename'] + TemplateCache.get(textfsm_template, engine).header
+        rows = 0
+        for records in Textfsmv._stream_host_file(
+                host_path, textfsm_template, host, use_mmap=use_mmap,
+                engine=engine):
+            rows += len(records)
+            if loader.column_types is None:
+                records = Parsev.all_element_to_str(records)
+            loader.add(records, header, table_name)
+        if rows == 0:
+            warning(
+                f'check textfsm template NO TEXTFSM RESULT! @ TABLE: {table_name} HOST: {host_path}')
+        seconds = time.perf_counter() - start
+        bytes_read = os.path.getsize(host_path)
+        Metrics.add(table_name, 'textfsm stream', seconds=seconds, rows=rows,
+                    bytes_read=bytes_read)
+        Metrics.add_file(table_name, host_path, seconds, bytes_read)
+
+    @staticmethod
+    def textfsmv_run_yaml(yaml_file, timestamp, excel_export=True, workers=1,
+                          export_tables=None, incremental=False):
+        """run with textfsm yaml file (path or ConfigPlan), workers is process count for parsing (0 for all cpu),
+        export_tables dict {sql_dbname: [table, ...]} collects excel tables (None for export at end of stage),
+        incremental parse only new/changed files and keep rows of unchanged files (use with stable timestamp='')"""
+        export_now = export_tables is None
+        if export_now:
+            export_tables = {}
+        parts = ConfigPlan.from_config(yaml_file).textfsm
+        scopes = Manifest.scopes([
+            (i['db_name'], i['table_name'].replace('.', '_').replace('-', '_').lower())
+            for i in parts])
+        for part, scope in zip(parts, scopes):
+            Textfsmv.textfsmv_run_part(
+                part, timestamp, workers, export_tables, incremental, scope)
+
+        if export_now:
+            Parsev.export(export_tables)
+
+    @staticmethod
+    def _checkpoint_files(loader, table_name, batch_files, manifest_rows, failed_files,
+                          template_hash, scope=0):
+        """ commit rows of parsed host files with their manifest rows (skipped by resumed/incremental run),
+        batch_files is [(host file path, host, loader position before file rows)], manifest_rows has content hash
+        only for incremental run, failed files saved with size -1 (rows deleted and parsed again at next run) """
+        loader.flush()
+        end = loader.added.get(table_name, 0)
+        rows = []
+        for host_path, host, start in reversed(batch_files):
+            row = manifest_rows.get(host_path)
+            if row is None or host_path in failed_files:
+                try:
+                    stat = os.stat(host_path)
+                    size, mtime = stat.st_size, stat.st_mtime
+                except OSError:
+                    size, mtime = -1, 0
+                if host_path in failed_files:
+                    size = -1
+                row = (table_name, scope, host_path, host, size, mtime, '', template_hash)
+            rows.append(row + (loader.rowid(table_name, start + 1),
+                               loader.rowid(table_name, end)))
+            end = start
+        Manifest.save(loader.con, rows)
+        loader.commit()
+
+    @staticmethod
+    def textfsmv_run_part(part, timestamp, workers=1, export_tables=None,
+                          incremental=False, scope=(0, 1)):
+        """run single textfsm part, excel table added to export_tables dict,
+        scope is (manifest scope, scope count) of parts writing same table"""
+        if export_tables is None:
+            export_tables = {}
+        part_start = time.perf_counter()
+        excel_export = True
+        # textfsm template from yaml
+        textfsm_input = part['template']
+        # db name from yaml
+        sql_dbname = part['db_name'] + timestamp
+        # table name from yaml AND replace some chars
+        table_name = part['table_name'].replace('.', '_').replace('-', '_')
+        if 'excel_export' in part:
+            if part['excel_export'].lower() == 'none':
+                excel_export = False
+        part_workers = int(part.get('workers', workers))
+        # files bigger than large_file_mb streamed line by line (or mmap with large_file_mode: mmap)
+        large_file_size = float(part.get('large_file_mb', 256)) * 1024 * 1024
+        use_mmap = str(part.get('large_file_mode', 'stream')).lower() == 'mmap'
+        # "engine: fast" for FastTextFSM with line prefilter (same result)
+        engine = str(part.get('engine', 'textfsm')).lower()
+        # compile template once per part (cached by content hash for other parts)
+        try:
+            fsm = TemplateCache.get(textfsm_input, engine)
+        except Exception as e:
+            error(f'check textfsm template @ TABLE: {table_name} : {e}')
+            raise SystemExit
+        # typed columns with "schema", list values as json arrays
+        column_types = ColumnTypes.from_part(part, fsm)
+        template_hash = TemplateCache.key(textfsm_input)
+        if column_types is not None:
+            template_hash = TemplateCache.key(
+                textfsm_input + json.dumps(column_types.schema, sort_keys=True))
+
+        # (host file path, host) list, yaml:files for single hosts and yaml:folders
+        host_files, file_sizes = Textfsmv._host_files_from_part(part)
+        # parsed files committed every checkpoint_files files (0 for only at end of part)
+        checkpoint_files = int(part.get('checkpoint_files', 100))
+
+        # parse (optionally in process pool) and write sqlite in single process
+        with SqlLoader(
+                sql_dbname,
+                batch_size=part.get('batch_size', 50000),
+                commit_interval=part.get('commit_interval', 0),
+                bulk_load=part.get('bulk_load', False),
+                column_types=column_types) as loader:
+            if incremental:
+                host_files, manifest_rows, touched_rows = Manifest.changed_host_files(
+                    loader.con, table_name, host_files, template_hash, *scope)
+                Manifest.save(loader.con, touched_rows)
+                manifest_rows = {i[2]: i for i in manifest_rows}
+            else:
+                Manifest.create(loader.con)
+                manifest_rows = {}
+            failed_files = set()
+            batch_files = []
+            # large files streamed in this process, record batches go straight to loader
+            large_files = {
+                i[0] for i in host_files
+                if file_sizes[i[0]] >= large_file_size}
+            if large_files and any('Fillup' in i.OptionNames() for i in fsm.values):
+                # Fillup fills earlier records, not possible for streamed chunks
+                warning(f'[{table_name}] Fillup value in template, {len(large_files)} large file(s) parsed as whole file')
+                large_files = set()
+            all_textfsm_result = Textfsmv._parse_host_files(
+                host_files, textfsm_input, part_workers, large_files, engine)
+            for (host_path, host), parse_result in zip(
+                    host_files, all_textfsm_result):
+                if checkpoint_files and len(batch_files) >= checkpoint_files:
+                    Textfsmv._checkpoint_files(
+                        loader, table_name, batch_files, manifest_rows,
+                        failed_files, template_hash, scope[0])
+                    batch_files = []
+                batch_files.append(
+                    (host_path, host, loader.added.get(table_name, 0)))
+                if parse_result is None:
                     try:
-                        if len(single_textfsm_result) < 2:
-                            warning(
-                                f'check textfsm template NO TEXTFSM RESULT! @ TABLE: {table_name} HOST: {host_file}')
-                            continue
-                        single_textfsm_result_header = single_textfsm_result[0]
-                        # single_textfsm_result_data = single_textfsm_result[1:]
-                        # convert list element to string
-                        single_textfsm_result_data = Parsev.all_element_to_str(
-                            single_textfsm_result[1:])
-                        Parsev.list_to_sql(
-                            single_textfsm_result_data,
-                            single_textfsm_result_header, sql_dbname,
-                            table_name)
+                        Textfsmv._load_large_host_file(
+                            loader, host_path, textfsm_input, host,
+                            table_name, use_mmap, engine)
                     except Exception as e:
-                        error(f'list to sql problem : {e}')
-
-            # for folders yaml:folders
-            if 'folders' in part:
-                for folder in part['folders']:
-                    all_host_file = os.listdir(folder + "/")
-                    for host_file in all_host_file:
-                        with open(folder + '/' + host_file, encoding='utf-8', errors='ignore') as file:
-                            host_file_text = file.read()
-                            # textfsm_result to sqlite
-                            single_textfsm_result = Textfsmv._textfsm_result_with_host(
-                                host_file_text, textfsm_input, host_file)
-                            try:
-                                if len(single_textfsm_result) < 2:
-                                    warning(
-                                        f'check textfsm template NO TEXTFSM RESULT! @ TABLE: {table_name} HOST: {host_file}')
-                                    continue
-                                single_textfsm_result_header = single_textfsm_result[0]
-                                # single_textfsm_result_data = single_textfsm_result[1:]
-                                # convert list element to string
-                                single_textfsm_result_data = Parsev.all_element_to_str(
-                                    single_textfsm_result[1:])
-                                Parsev.list_to_sql(
-                                    single_textfsm_result_data,
-                                    single_textfsm_result_header, sql_dbname,
-                                    table_name)
-                            except Exception as e:
-                                error(f'list to sql problem : {e}')
-
-            info(f'[{table_name}] / [{sql_dbname}] SQL COMPLETED!')
-            # excel export
-            if excel_export:
+                        failed_files.add(host_path)
+                        error(f'large file problem @ {host_path} : {e}')
+                    continue
+                single_textfsm_result, read_seconds, parse_seconds, bytes_read = parse_result
+                if single_textfsm_result is None:
+                    failed_files.add(host_path)
+                    continue
+                Metrics.add(table_name, 'file read',
+                            seconds=read_seconds, bytes_read=bytes_read)
+                Metrics.add(table_name, 'textfsm parse',
+                            seconds=parse_seconds,
+                            rows=len(single_textfsm_result) - 1)
+                Metrics.add_file(table_name, host_path,
+                                 read_seconds + parse_seconds, bytes_read)
                 try:
-                    Parsev.dbtable_to_xlsx(
-                        sql_dbname + '.sqlite3', table_name, sql_dbname,
-                        table_name)
-                    info(f'[{table_name}] / [{sql_dbname}] EXCEL SHEET COMPLETED!')
+                    if len(single_textfsm_result) < 2:
+                        warning(
+                            f'check textfsm template NO TEXTFSM RESULT! @ TABLE: {table_name} HOST: {host_path}')
+                        continue
+                    single_textfsm_result_header = single_textfsm_result[0]
+                    # convert list element to string (typed columns converted by loader)
+                    if column_types is None:
+                        single_textfsm_result_data = Parsev.all_element_to_str(
+                            single_textfsm_result[1:])
+                    else:
+                        single_textfsm_result_data = single_textfsm_result[1:]
+                    loader.add(
+                        single_textfsm_result_data,
+                        single_textfsm_result_header, table_name)
                 except Exception as e:
-                    error(f'sql to excel problem : {e}')
+                    failed_files.add(host_path)
+                    error(f'list to sql problem : {e}')
+            # failed files parsed again at next resumed/incremental run
+            Textfsmv._checkpoint_files(
+                loader, table_name, batch_files, manifest_rows,
+                failed_files, template_hash, scope[0])
+            if not failed_files:
+                Checkpoint.save(loader.con, part, table_name)
+        Metrics.add(table_name, 'sqlite insert',
+                    seconds=loader.insert_seconds, rows=loader.rows)
+        Metrics.add(table_name, 'textfsm part',
+                    seconds=time.perf_counter() - part_start,
+                    rows=loader.rows, count=len(host_files))
+        if failed_files:
+            # rows of other files committed, part fails (dependent parts skipped, exit code 1)
+            error(f'[{table_name}] {len(failed_files)} FILE(S) FAILED! (parsed again with --resume)')
+            raise Exception(f'{len(failed_files)} file(s) failed @ TABLE: {table_name}')
+
+        info(f'[{table_name}] / [{sql_dbname}] SQL COMPLETED! {TemplateCache.stats()}')
+        # excel export
+        if excel_export:
+            export_tables.setdefault(sql_dbname, []).append(
+                Parsev.export_entry(part, table_name))
+
+        if 'files' not in part and 'folders' not in part:
+            error('no files or folder in yaml')
 
-            if 'files' not in part and 'folders' not in part:
-                error('no files or folder in yaml')
 
 
 class Sqljoinv:
     """ Sqljoin class """
     @staticmethod
-    def _get_functions_from_config(yaml_file):
-        functions_text = ''
-        all_parts = [i for i in Parsev.yaml_file_to_list(
-            yaml_file) if i['type'] == 'sqlfunction']
+    def _parse_index(index) -> tuple:
+        """ 'table(col1, col2)' or {'table': table, 'columns': [col1, col2]} to (table, [col1, col2]) """
+        if isinstance(index, dict):
+            columns = index['columns']
+            if isinstance(columns, str):
+                columns = columns.split(',')
+            return index['table'], [i.strip() for i in columns]
+        matched = re.match(r'^\s*(\w+)\s*\((.+)\)\s*$', index)
+        if not matched:
+            raise ValueError(f'index must be <table(col1, col2)> : {index}')
+        return matched.group(1), [i.strip() for i in matched.group(2).split(',')]
 
-        for part in all_parts:
-            if 'functions' in part:
-                for func in part['functions']:
-                    functions_text += func + '\n'
+    @staticmethod
+    def _part_indexes(part) -> list:
+        """ [(table, [columns])] from "indexes" key and auto left join match columns of second_table
+        ("auto_index: none" disables auto join index) """
+        indexes = [Sqljoinv._parse_index(i) for i in part.get('indexes', [])]
+        if 'sqlcommand' in part or str(part.get('auto_index', '')).lower() == 'none':
+            return indexes
+        second_table = part['second_table']
+        match = part['match']
+        if '=' in match:
+            columns = re.findall(
+                rf'\b{re.escape(second_table)}\.(\w+)', match)
+        else:
+            columns = [i.strip() for i in match.split(',')] + ['Filename']
+        # unique columns in match order
+        columns = list(dict.fromkeys(columns))
+        if columns:
+            indexes.append((second_table, columns))
+        return indexes
 
-        return functions_text
+    @staticmethod
+    def _create_indexes(cur, indexes):
+        """ create index if not exists and ANALYZE table """
+        for table, columns in indexes:
+            index_name = re.sub(r'\W', '_', f'p2e_idx_{table}_' + '_'.join(columns))
+            index_columns = ', '.join(f'"{i}"' for i in columns)
+            cur.execute(
+                f'CREATE INDEX IF NOT EXISTS "{index_name}" ON {table} ({index_columns})')
+            cur.execute(f'ANALYZE {table}')
+            info(f'[{table}] INDEX {index_name} ({index_columns})')
 
     @staticmethod
-    def sqljoinv_run_yaml(yaml_file, timestamp, excel_export=True):
-        """run with sqljoin yaml file"""
-        all_parts = [i for i in Parsev.yaml_file_to_list(
-            yaml_file) if i['type'] == 'sqljoin']
+    def _log_query_plan(cur, new_table, sqlcommand):
+        """ log EXPLAIN QUERY PLAN of sqljoin select """
+        import sqlite3
+        try:
+            query_plan = cur.execute(
+                f'EXPLAIN QUERY PLAN {sqlcommand}').fetchall()
+        except sqlite3.Error as e:
+            warning(f'[{new_table}] no query plan : {e}')
+            return
+        info(f'[{new_table}] QUERY PLAN: ' +
+             ' | '.join(str(i[-1]) for i in query_plan))
 
-        for part in all_parts:
-            excel_export = True
-            try:
-                sql_dbname = part['db_name'] + timestamp
-                if 'excel_export' in part:
-                    if part['excel_export'].lower() == 'none':
-                        excel_export = False
-                if 'sqlcommand' in part:
-                    sqlcommand = part['sqlcommand']
-                    new_table = part['new_table']
-
-                    # if sqlfunction type in config
-                    sqlfunction_text = Sqljoinv._get_functions_from_config(
-                        yaml_file).strip()
-                    if sqlfunction_text != '':
-                        # split with "^def" regex and strip
-                        func_files_list = [
-                            'def ' + i
-                            for i in re.split(
-                                '^def ', sqlfunction_text,
-                                flags=re.MULTILINE) if i]
-                        for func in func_files_list:
-                            # below lines same as non-file function
-                            func_name = func.split('def ')[1].split('(')[0]
-
-                            ###
-                            # add try/except to custom function
-                            func_try_prefix = "  try:"
-                            func_try_suffix = "  except Exception as e:\n    print('check custom function @ " + \
-                                func_name + " : ' + str(e))"
-                            # new func without FIRST 'def x(..):' line
-                            new_func_wo_def = '\n'.join(
-                                [f'  {i}' for i in func.splitlines()[1:]])
-                            first_def_line = func.splitlines()[0]
-                            if 'def ' not in first_def_line:
-                                error(
-                                    f'check custom function @ {func_name}: custom function not started with <def >')
-                                raise Exception(
-                                    f'check custom function @ {func_name}: custom function not started with <def >')
-                            new_func = f'{first_def_line}\n{func_try_prefix}\n{new_func_wo_def}\n{func_try_suffix}\n'
-                            ###
-
-                            # adding global to def
-                            global_text = f"global {func_name}\n"
-                            # exec with new function text
-                            def_text_exec = global_text + new_func
-                            Parsev.text_to_exec(def_text_exec)
-
-                    # if function exist
-                    if 'functions' in part:
-                        for func in part['functions']:
-                            func_name = func.split('def ')[1].split('(')[0]
-
-                            ###
-                            # add try/except to custom function
-                            func_try_prefix = "  try:"
-                            func_try_suffix = "  except Exception as e:\n    print('check custom function @ " + \
-                                func_name + " : ' + str(e))"
-                            # new func without FIRST 'def x(..):' line
-                            new_func_wo_def = '\n'.join(
-                                [f'  {i}' for i in func.splitlines()[1:]])
-                            first_def_line = func.splitlines()[0]
-                            if 'def ' not in first_def_line:
-                                error(
-                                    f'check custom function @ {func_name}: custom function not started with <def >')
-                                raise Exception(
-                                    f'check custom function @ {func_name}: custom function not started with <def >')
-                            new_func = f'{first_def_line}\n{func_try_prefix}\n{new_func_wo_def}\n{func_try_suffix}\n'
-                            ###
-
-                            # adding global to def
-                            global_text = f"global {func_name}\n"
-                            # exec with new function text
-                            def_text_exec = global_text + new_func
-                            Parsev.text_to_exec(def_text_exec)
-
-                elif 'sqlcommand_run' in part:
-                    sqlcommand = part['sqlcommand_run']
-                    new_table = 'CUSTOM SQL COMMAND RUN'
-                    excel_export = False
+    @staticmethod
+    def sqljoinv_run_yaml(yaml_file, timestamp, excel_export=True,
+                          export_tables=None):
+        """run with sqljoin yaml file (path or ConfigPlan), export_tables dict {sql_dbname: [table, ...]} collects excel tables
+        (None for export at end of stage)"""
+        export_now = export_tables is None
+        if export_now:
+            export_tables = {}
+        plan = ConfigPlan.from_config(yaml_file)
+        for part in plan.sqljoin:
+            Sqljoinv.sqljoinv_run_part(part, plan, timestamp, export_tables)
+
+        if export_now:
+            Parsev.export(export_tables)
+
+    @staticmethod
+    def part_sqlcommand(part):
+        """ return (new_table, sqlcommand) of sqljoin part, sqlcommand / sqlcommand_run or auto left join
+        with first_table, second_table and match """
+        if 'sqlcommand' in part:
+            return part['new_table'], part['sqlcommand']
+        if 'sqlcommand_run' in part:
+            return 'CUSTOM SQL COMMAND RUN', part['sqlcommand_run']
+
+        # auto left join
+        first_table = part['first_table']
+        second_table = part['second_table']
+        match = part['match']
+
+        if '=' in match:
+            sqlcommand = (
+                f'SELECT * FROM {first_table} '
+                f'LEFT OUTER JOIN {second_table} '
+                f'ON {match} '
+            )
+        else:
+            match_list = [i.strip() for i in match.split(',')]
+            match_list.append('Filename')
+            on_command = ''
+            for m in match_list:
+                on_command += f'{first_table}.{m} = {second_table}.{m} AND '
+            on_command = on_command[:-5]
+            sqlcommand = (
+                f'SELECT * FROM {first_table} '
+                f'LEFT OUTER JOIN {second_table} '
+                f'ON {on_command}'
+            )
+        return part['new_table'], sqlcommand
+
+    @staticmethod
+    def run_sqljoin(con, part, plan):
+        """ run sqljoin part on open sqlite connection with plan functions, return new table name """
+        new_table, sqlcommand = Sqljoinv.part_sqlcommand(part)
+        with con:
+            cur = con.cursor()
+            # sqlfunction and part functions, compiled once per run
+            plan.function_registry.register(con, part)
+
+            # indexes on join keys (auto left join) and "indexes" key, ANALYZE and log query plan
+            if 'sqlcommand_run' not in part:
+                with Metrics.stage(new_table, 'sqljoin index'):
+                    Sqljoinv._create_indexes(
+                        cur, Sqljoinv._part_indexes(part))
+                Sqljoinv._log_query_plan(cur, new_table, sqlcommand)
 
-                # auto left join
+            # Run raw sqlite3 command if sqlcommand_run in config
+            with Metrics.stage(new_table, 'sqljoin query'):
+                if 'sqlcommand_run' in part:
+                    cur.execute(f"{sqlcommand}")
+                    info(
+                        f'SQL COMMAND: {sqlcommand} RESULT: {cur.fetchall()}')
                 else:
-                    first_table = part['first_table']
-                    second_table = part['second_table']
-                    match = part['match']
-                    new_table = part['new_table']
-
-                    if '=' in match:
-                        sqlcommand = (
-                            f'SELECT * FROM {first_table} '
-                            f'LEFT OUTER JOIN {second_table} '
-                            f'ON {match} '
-                        )
-                    else:
-                        match_list = [i.strip() for i in match.split(',')]
-                        match_list.append('Filename')
-                        on_command = ''
-                        for m in match_list:
-                            on_command += f'{first_table}.{m} = {second_table}.{m} AND '
-                        on_command = on_command[:-5]
-                        sqlcommand = (
-                            f'SELECT * FROM {first_table} '
-                            f'LEFT OUTER JOIN {second_table} '
-                            f'ON {on_command}'
-                        )
-                #
-
-                with sqlite3.connect(sql_dbname+".sqlite3") as con:
-                    cur = con.cursor()
-                    # if sqlfunction type in config
-                    sqlfunction_text = Sqljoinv._get_functions_from_config(
-                        yaml_file).strip()
-                    if sqlfunction_text != '':
-                        # split with "^def" regex and strip
-                        func_files_list = [
-                            'def ' + i
-                            for i in re.split(
-                                '^def ', sqlfunction_text,
-                                flags=re.MULTILINE) if i]
-                        for func in func_files_list:
-                            # below lines same as non-file function
-                            func_name = func.split('def ')[1].split('(')[0]
-                            con.create_function(
-                                func_name,
-                                globals()[func_name].__code__.co_argcount,
-                                globals()[func_name])
-                    # if function exist
-                    if 'functions' in part:
-                        for func in part['functions']:
-                            func_name = func.split('def ')[1].split('(')[0]
-                            con.create_function(
-                                func_name,
-                                globals()[func_name].__code__.co_argcount,
-                                globals()[func_name])
-
-                    # Run raw sqlite3 command if sqlcommand_run in config
-                    if 'sqlcommand_run' in part:
-                        cur.execute(f"{sqlcommand}")
-                        info(
-                            f'SQL COMMAND: {sqlcommand} RESULT: {cur.fetchall()}')
-                    else:
-                        cur.execute(f"drop table if exists {new_table}")
-                        cur.execute(
-                            f"CREATE TABLE {new_table} AS {sqlcommand}")
+                    cur.execute(f"drop table if exists {new_table}")
+                    cur.execute(
+                        f"CREATE TABLE {new_table} AS {sqlcommand}")
+        return new_table
 
-            except Exception as e:
-                error(f'check sqljoin @ {part} : {e}')
-                # continue other parts
-                continue
+    @staticmethod
+    def sqljoinv_run_part(part, plan, timestamp, export_tables=None):
+        """run single sqljoin part with plan functions, excel table added to export_tables dict"""
+        import sqlite3
+        if export_tables is None:
+            export_tables = {}
+        excel_export = 'sqlcommand_run' not in part
+        try:
+            sql_dbname = part['db_name'] + timestamp
+            if 'excel_export' in part:
+                if part['excel_export'].lower() == 'none':
+                    excel_export = False
+            con = sqlite3.connect(sql_dbname+".sqlite3")
+            try:
+                new_table = Sqljoinv.run_sqljoin(con, part, plan)
+                Checkpoint.save(con, part, new_table)
+                con.commit()
+            finally:
+                con.close()
 
-            info(f'[{new_table}] / [{sql_dbname}] SQL COMPLETED!')
-            # excel export
-            if excel_export:
-                try:
-                    Parsev.dbtable_to_xlsx(
-                        sql_dbname + '.sqlite3', new_table, sql_dbname,
-                        new_table)
-                    info(f'[{new_table}] / [{sql_dbname}] EXCEL SHEET COMPLETED!')
-                except Exception as e:
-                    error(f'sql to excel problem : {e}')
+        except Exception as e:
+            error(f'check sqljoin @ {part} : {e}')
+            # part failed, scheduler skips dependent parts
+            raise
+
+        info(f'[{new_table}] / [{sql_dbname}] SQL COMPLETED!')
+        # excel export
+        if excel_export:
+            export_tables.setdefault(sql_dbname, []).append(
+                Parsev.export_entry(part, new_table))
 
 
 class Excel2Sql:
     """ Excel file to Sqlite """
     @staticmethod
-    def _get_excel_row(
-            excel_sheet, row_start=None, row_end=None, col_start=None,
-            col_end=None):
-        ''' Strip cell and remove none values, excel_sheet is worksheet in openpyxl workbook '''
-
-        table_strip = []
+    def _iter_excel_row(excel_sheet, row_start=None, col_start=None):
+        ''' Strip cell and remove none values, excel_sheet is worksheet in openpyxl workbook, yield rows '''
         for row in excel_sheet.iter_rows(
-                min_row=row_start, max_row=row_end, min_col=col_start,
-                max_col=col_end, values_only=True):
+                min_row=row_start, min_col=col_start, values_only=True):
             # 'None' to ''
-            row_strip_wo_none = []
-            for i in row:
-                if str(i) == 'None':
-                    row_strip_wo_none.append('')
-                else:
-                    row_strip_wo_none.append(str(i).strip())
-            table_strip.append(row_strip_wo_none)
-        return table_strip
+            yield ['' if i is None else str(i).strip() for i in row]
 
     @staticmethod
-    def excel_to_sql(excel_file, excel_sheets=None, db_name=None):
-        """ Convert excel file to sqlite file: excel_sheets is list (['sheetname1', 'sheetname2']) OR None for all sheets """
-        wb = load_workbook(filename=excel_file, data_only=True)
+    def excel_to_sql(excel_file, excel_sheets=None, db_name=None, replace=False,
+                     batch_size=10000, con=None):
+        """ Convert excel file to sqlite file: excel_sheets is list (['sheetname1', 'sheetname2']) OR None for all sheets,
+        replace drop sheet table before import, rows streamed from read_only workbook and inserted with batch_size,
+        con is open sqlite connection to use instead of db file, return imported row count """
+        from openpyxl import load_workbook
+        wb = load_workbook(filename=excel_file, read_only=True, data_only=True)
         if not db_name:
             db_name = excel_file.split('.xl')[0]
 
-        for sheet in wb:
-            sheet_name = sheet.title
-            # check excel_sheets specify
-            if excel_sheets and sheet_name in excel_sheets:
-                sheet = wb[sheet_name]
-            header = Excel2Sql._get_excel_row(
-                sheet, row_start=1, col_start=1)[0]
-            header_wo_none = [i for i in header if i != '']
-            data = Excel2Sql._get_excel_row(sheet, row_start=2, col_start=1)
-            Parsev.list_to_sql(data, header_wo_none, db_name, sheet_name)
+        try:
+            with SqlLoader(db_name, batch_size=batch_size, con=con) as loader:
+                for sheet in wb:
+                    sheet_name = sheet.title
+                    # check excel_sheets specify
+                    if excel_sheets and sheet_name not in excel_sheets:
+                        continue
+                    rows = Excel2Sql._iter_excel_row(
+                        sheet, row_start=1, col_start=1)
+                    header = next(rows, None)
+                    if header is None:
+                        warning(f'empty excel sheet @ {sheet_name}')
+                        continue
+                    # only columns with header, empty rows skipped
+                    header_index = [i for i, h in enumerate(header) if h != '']
+                    header_wo_none = [header[i] for i in header_index]
+                    if replace:
+                        loader.cur.execute('drop table if exists ' + sheet_name)
+                    loader.create_table(header_wo_none, sheet_name)
+                    batch = []
+                    for row in rows:
+                        row = row + [''] * (len(header) - len(row))
+                        row = [row[i] for i in header_index]
+                        if not any(row):
+                            continue
+                        batch.append(row)
+                        if len(batch) >= batch_size:
+                            loader.add(batch, header_wo_none, sheet_name)
+                            batch = []
+                    loader.add(batch, header_wo_none, sheet_name)
+        finally:
+            wb.close()
+        return loader.rows
 
     @staticmethod
-    def excel_run_yaml(yaml_file, timestamp):
-        """ run with sqljoin yaml file """
-        all_parts = [i for i in Parsev.yaml_file_to_list(
-            yaml_file) if i['type'] == 'excel']
+    def excel_run_yaml(yaml_file, timestamp, replace=False):
+        """ run with excel yaml file (path or ConfigPlan), replace drop sheet tables before import (for stable db) """
+        for part in ConfigPlan.from_config(yaml_file).excel:
+            Excel2Sql.excel_run_part(part, timestamp, replace)
 
-        for part in all_parts:
+    @staticmethod
+    def excel_run_part(part, timestamp, replace=False):
+        """ run single excel part, replace drop sheet tables before import (for stable db) """
+        import sqlite3
+        try:
+            sql_dbname = part['db_name'] + timestamp
+            excel_file = part['excel_file']
+            excel_sheets = None
+            # check excel_sheets
+            if 'excel_sheets' in part:
+                excel_sheets = part['excel_sheets']
+            start = time.perf_counter()
+            rows = Excel2Sql.excel_to_sql(
+                excel_file, excel_sheets=excel_sheets, db_name=sql_dbname,
+                replace=replace, batch_size=part.get('batch_size', 10000))
+            Metrics.add(excel_file, 'excel import',
+                        seconds=time.perf_counter() - start, rows=rows,
+                        bytes_read=os.path.getsize(excel_file))
+            con = sqlite3.connect(sql_dbname + '.sqlite3')
             try:
-                sql_dbname = part['db_name'] + timestamp
-                excel_file = part['excel_file']
-                excel_sheets = None
-                # check excel_sheets
-                if 'excel_sheets' in part:
-                    excel_sheets = part['excel_sheets']
-                Excel2Sql.excel_to_sql(
-                    excel_file, excel_sheets=excel_sheets, db_name=sql_dbname)
-                info(f'[{excel_file}] EXCEL TO SQL COMPLETED!')
+                Checkpoint.save(con, part, excel_file)
+                con.commit()
+            finally:
+                con.close()
+            info(f'[{excel_file}] EXCEL TO SQL COMPLETED!')
+        except Exception as e:
+            error(f'check excel @ {part} : {e}')
+            raise SystemExit
+
+
+class FunctionRegistry:
+    """ Sqlite python functions of sqlfunction/sqljoin parts compiled once per run and registered as deterministic,
+    optional LRU cache with part key "lru_cache: <maxsize>" """
+
+    def __init__(self, sqlfunction_parts=()):
+        self.sqlfunction_parts = list(sqlfunction_parts)
+        # functions share one namespace (with module globals), so they can call each other
+        self.namespace = dict(globals())
+        self._functions = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def split_functions(functions) -> list:
+        """ split function texts with "^def" regex to single function texts """
+        functions_text = ''.join(func + '\n' for func in functions).strip()
+        return [
+            'def ' + i for i in re.split('^def ', functions_text, flags=re.MULTILINE)
+            if i.strip()]
+
+    @staticmethod
+    def _safe_function(func_name, func):
+        """ add try/except to custom function """
+        def safe_function(*args):
+            try:
+                return func(*args)
             except Exception as e:
-                error(f'check excel @ {part} : {e}')
-                raise SystemExit
+                print(f'check custom function @ {func_name} : {e}')
+        return safe_function
+
+    def compile(self, func_text, lru_size=0):
+        """ return (name, arg count, function) for function text, compiled only at first call """
+        key = (TemplateCache.key(func_text), lru_size)
+        with self._lock:
+            if key not in self._functions:
+                func_name = func_text.split('def ')[1].split('(')[0].strip()
+                exec(compile(ast.parse(func_text), '', mode='exec'), self.namespace)
+                func = self.namespace[func_name]
+                code = func.__code__
+                # *args functions accept any arg count
+                narg = -1 if code.co_flags & 0x04 else code.co_argcount
+                function = FunctionRegistry._safe_function(func_name, func)
+                if lru_size:
+                    function = lru_cache(maxsize=int(lru_size))(function)
+                self._functions[key] = (func_name, narg, function)
+            return self._functions[key]
+
+    def functions_for_part(self, part) -> list:
+        """ (name, arg count, function) list of all sqlfunction parts and sqljoin part functions """
+        result = []
+        for func_part in self.sqlfunction_parts + [part]:
+            for func_text in FunctionRegistry.split_functions(
+                    func_part.get('functions', [])):
+                result.append(self.compile(
+                    func_text, func_part.get('lru_cache', 0)))
+        return result
+
+    def register(self, con, part):
+        """ create functions for sqlite connection, deterministic if sqlite supports """
+        import sqlite3
+        for func_name, narg, function in self.functions_for_part(part):
+            try:
+                con.create_function(func_name, narg, function, deterministic=True)
+            except sqlite3.NotSupportedError:
+                con.create_function(func_name, narg, function)
+
+    def log_stats(self):
+        """ log LRU cache hits of functions """
+        for func_name, _, function in self._functions.values():
+            if hasattr(function, 'cache_info'):
+                cache_info = function.cache_info()
+                info(f'FUNCTION CACHE {func_name} hits={cache_info.hits} '
+                     f'misses={cache_info.misses} size={cache_info.currsize}')
+
+
+class Scheduler:
+    """ Dependency-aware runner for config parts
+
+    Parts are nodes in stage order (excel, textfsm, sqljoin) of every config. Edges are only added between parts
+    of the same sqlite db when they write or read the same tables (tables in sqlcommand, first_table/second_table)
+    or when table set is unknown (sqlcommand_run, excel without excel_sheets). Independent parts run in
+    threads, every sqlite db has single writer at a time. Resumed run skips parts completed at checkpoint
+    (if parts they depend on are skipped too).
+    """
+
+    STAGES = ('excel', 'textfsm', 'sqljoin')
+
+    def __init__(self, plans, timestamp, workers=1, incremental=False,
+                 resume=False):
+        self.timestamp = timestamp
+        self.workers = workers
+        self.incremental = incremental
+        # only first run is resumed
+        self.resume = resume
+        self.nodes = []
+        # node id -> export_tables of last run of node
+        self.node_exports = {}
+        self._executor = None
+        self._executor_jobs = 0
+        for plan in plans:
+            for stage in Scheduler.STAGES:
+                for part in getattr(plan, stage):
+                    self.nodes.append(self._node(len(self.nodes), plan, part))
+        # manifest scope of textfsm parts writing same table
+        textfsm_nodes = [i for i in self.nodes if i['part']['type'] == 'textfsm']
+        for node, scope in zip(textfsm_nodes, Manifest.scopes(
+                [(i['db'], i['name'].lower()) for i in textfsm_nodes])):
+            node['scope'] = scope
+        self._add_edges()
+
+    @staticmethod
+    def _sql_names(sqlcommand) -> set:
+        return {i.lower() for i in re.findall(r'[A-Za-z_][A-Za-z0-9_]*', sqlcommand)}
+
+    def _node(self, node_id, plan, part) -> dict:
+        """ node with produced tables (None for unknown) and referenced names """
+        produces, references = set(), set()
+        if part['type'] == 'excel':
+            sheets = part.get('excel_sheets')
+            produces = {i.lower() for i in sheets} if sheets else None
+            name = part['excel_file']
+        elif part['type'] == 'textfsm':
+            name = part['table_name'].replace('.', '_').replace('-', '_')
+            produces = {name.lower()}
+        elif 'sqlcommand' in part:
+            name = part['new_table']
+            produces = {name.lower()}
+            references = Scheduler._sql_names(part['sqlcommand'])
+        elif 'sqlcommand_run' in part:
+            name = 'sqlcommand_run'
+            produces = None
+        else:
+            name = part['new_table']
+            produces = {name.lower()}
+            references = {part['first_table'].lower(), part['second_table'].lower()}
+        return {
+            'id': node_id, 'plan': plan, 'part': part, 'name': name,
+            'db': part['db_name'] + self.timestamp, 'produces': produces,
+            'references': references, 'deps': set()}
+
+    def _add_edges(self):
+        for index, node in enumerate(self.nodes):
+            for before in self.nodes[:index]:
+                if before['db'] != node['db']:
+                    continue
+                if before['produces'] is None or node['produces'] is None or (
+                        before['produces'] & (node['references'] | node['produces'])) or (
+                        before['references'] & node['produces']):
+                    node['deps'].add(before['id'])
+
+    def describe(self) -> str:
+        """ plan text for dry run, nodes grouped by level (same level nodes can run in parallel) """
+        levels = {}
+        for node in self.nodes:
+            levels[node['id']] = 1 + max(
+                (levels[i] for i in node['deps']), default=-1)
+        lines = []
+        for level in sorted(set(levels.values())):
+            lines.append(f'LEVEL {level}:')
+            for node in self.nodes:
+                if levels[node['id']] == level:
+                    deps = ', '.join(str(i) for i in sorted(node['deps'])) or '-'
+                    lines.append(
+                        f"  [{node['id']}] {node['part']['type']} {node['name']} @ {node['db']} "
+                        f"<{node['plan'].source}> depends on: {deps}")
+        return '\n'.join(lines)
+
+    def _run_node(self, node, export_tables):
+        part = node['part']
+        if part['type'] == 'excel':
+            Excel2Sql.excel_run_part(part, self.timestamp, self.incremental)
+        elif part['type'] == 'textfsm':
+            Textfsmv.textfsmv_run_part(
+                part, self.timestamp, self.workers, export_tables,
+                self.incremental, node['scope'])
+        else:
+            Sqljoinv.sqljoinv_run_part(
+                part, node['plan'], self.timestamp, export_tables)
+
+    def _skip_completed(self, pending, done):
+        """ move nodes completed at checkpoint from pending to done, their tables exported again """
+        completed = {}
+        for node in self.nodes:
+            if node['id'] not in pending or not node['deps'] <= done:
+                continue
+            if node['db'] not in completed:
+                completed[node['db']] = Checkpoint.completed(node['db'])
+            if Checkpoint.key(node['part']) not in completed[node['db']]:
+                continue
+            info(f"[{node['name']}] SKIPPED, COMPLETED AT CHECKPOINT!")
+            part = node['part']
+            self.node_exports[node['id']] = {}
+            if part['type'] != 'excel' and 'sqlcommand_run' not in part and str(
+                    part.get('excel_export', '')).lower() != 'none':
+                self.node_exports[node['id']][node['db']] = [
+                    Parsev.export_entry(part, node['name'])]
+            done.add(node['id'])
+            del pending[node['id']]
+
+    def _get_executor(self, jobs):
+        if self._executor is None or self._executor_jobs != max(1, jobs):
+            self.close()
+            self._executor_jobs = max(1, jobs)
+            self._executor = ThreadPoolExecutor(max_workers=self._executor_jobs)
+        return self._executor
+
+    def close(self):
+        """ shutdown part threads """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def dependents(self, node_ids) -> set:
+        """ node ids with all nodes depending on them (directly or indirectly) """
+        node_ids = set(node_ids)
+        for node in self.nodes:
+            if node['deps'] & node_ids:
+                node_ids.add(node['id'])
+        return node_ids
+
+    def run(self, jobs=1, node_ids=None):
+        """ run all nodes (or only node_ids, other nodes counted as done) with jobs threads,
+        return (export_tables of all nodes run so far in node order, failed node list),
+        dependents of failed nodes are skipped """
+        pending = {node['id']: node for node in self.nodes
+                   if node_ids is None or node['id'] in node_ids}
+        done, failed, skipped = {i['id'] for i in self.nodes} - set(pending), [], set()
+        if self.resume:
+            self._skip_completed(pending, done)
+            self.resume = False
+        busy_dbs = set()
+        running = {}
+        # executor (and threads with compiled templates) kept for next runs
+        executor = self._get_executor(jobs)
+        while pending or running:
+            for node_id, node in list(pending.items()):
+                if node['deps'] & ({i['id'] for i in failed} | skipped):
+                    error(f"[{node['name']}] SKIPPED, DEPENDS ON FAILED PART!")
+                    skipped.add(node_id)
+                    del pending[node_id]
+            for node_id, node in list(pending.items()):
+                if len(running) >= max(1, jobs):
+                    break
+                if node['db'] in busy_dbs or not node['deps'] <= done:
+                    continue
+                busy_dbs.add(node['db'])
+                self.node_exports[node_id] = {}
+                running[executor.submit(
+                    self._run_node, node, self.node_exports[node_id])] = node
+                del pending[node_id]
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                node = running.pop(future)
+                busy_dbs.discard(node['db'])
+                try:
+                    future.result()
+                    done.add(node['id'])
+                except BaseException as e:
+                    error(f"[{node['name']}] PART FAILED! : {e!r}")
+                    failed.append(node)
+        export_tables = {}
+        for node in self.nodes:
+            for sql_dbname, tables in self.node_exports.get(node['id'], {}).items():
+                export_tables.setdefault(sql_dbname, []).extend(tables)
+        return export_tables, failed
+
+
+class Watcher:
+    """ Watch mode for stable db (incremental), textfsm folders/files and excel files are polled every interval
+    (optional watchdog package wakes up at file events), only new/changed files are parsed and
+    parts depending on touched tables are run again, compiled templates and functions are kept between runs """
+
+    def __init__(self, scheduler, interval=2.0):
+        self.scheduler = scheduler
+        self.interval = max(0.1, float(interval))
+        self._event = threading.Event()
+        self._observer = None
+        self._snapshots = {
+            node['id']: self._snapshot(node) for node in scheduler.nodes}
+
+    @staticmethod
+    def _snapshot(node) -> dict:
+        """ {path: (size, mtime)} of node input files (empty for sqljoin) """
+        part = node['part']
+        if part['type'] == 'textfsm':
+            paths = [i[0] for i in Textfsmv._host_files_from_part(part)[0]]
+        elif part['type'] == 'excel':
+            paths = [part['excel_file']]
+        else:
+            return {}
+        snapshot = {}
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                pass
+        return snapshot
+
+    def _watch_folders(self) -> set:
+        folders = set()
+        for node in self.scheduler.nodes:
+            part = node['part']
+            if part['type'] == 'textfsm':
+                folders.update(
+                    Textfsmv._folder_spec(i, part)['folder'] for i in part.get('folders', []))
+                folders.update(os.path.dirname(i) or '.' for i in part.get('files', []))
+            elif part['type'] == 'excel':
+                folders.add(os.path.dirname(part['excel_file']) or '.')
+        return {i for i in folders if os.path.isdir(i)}
+
+    def _start_observer(self):
+        """ wake up polling at file events with watchdog (inotify etc.) if installed """
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            info(f'WATCH POLLING EVERY {self.interval}s')
+            return
+        event = self._event
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, file_event):
+                event.set()
+
+        self._observer = Observer()
+        for folder in self._watch_folders():
+            self._observer.schedule(Handler(), folder, recursive=True)
+        self._observer.daemon = True
+        self._observer.start()
+        info(f'WATCH FILE EVENTS (POLLING EVERY {self.interval}s)')
+
+    def changed_nodes(self) -> set:
+        """ node ids with new, changed or removed input files since last check """
+        changed = set()
+        for node in self.scheduler.nodes:
+            if node['part']['type'] not in ('textfsm', 'excel'):
+                continue
+            snapshot = self._snapshot(node)
+            if snapshot != self._snapshots[node['id']]:
+                changed.add(node['id'])
+                self._snapshots[node['id']] = snapshot
+        return changed
+
+    def run_once(self, jobs=1, export_format='xlsx') -> list:
+        """ run changed parts and their dependents, export tables of touched dbs, return run node ids """
+        changed = self.changed_nodes()
+        if not changed:
+            return []
+        node_ids = self.scheduler.dependents(changed)
+        start = time.perf_counter()
+        export_tables, failed = self.scheduler.run(jobs=jobs, node_ids=node_ids)
+        touched_dbs = {i['db'] for i in self.scheduler.nodes if i['id'] in node_ids}
+        Parsev.export(
+            {k: v for k, v in export_tables.items() if k in touched_dbs},
+            export_format)
+        names = ', '.join(i['name'] for i in self.scheduler.nodes if i['id'] in node_ids)
+        info(f'WATCH: {len(node_ids)} PART(S) RUN IN {time.perf_counter() - start:.2f}s <{names}>')
+        if failed:
+            error(f"WATCH: {len(failed)} part(s) failed: {', '.join(i['name'] for i in failed)}")
+        return sorted(node_ids)
+
+    def watch(self, jobs=1, export_format='xlsx', max_cycles=None):
+        """ check changes every interval until KeyboardInterrupt (or max_cycles checks) """
+        self._start_observer()
+        cycles = 0
+        try:
+            while max_cycles is None or cycles < max_cycles:
+                self._event.wait(self.interval)
+                if self._event.is_set():
+                    # wait shortly for writer to finish the file
+                    time.sleep(min(0.5, self.interval))
+                    self._event.clear()
+                self.run_once(jobs, export_format)
+                cycles += 1
+        except KeyboardInterrupt:
+            info('WATCH STOPPED!')
+        finally:
+            if self._observer is not None:
+                self._observer.stop()
+
+
+class Pipeline:
+    """ Programmatic API, all parts run on one sqlite connection (":memory:" by default, db_name of parts not used),
+    textfsm parts parse texts in memory (or files/folders of part), results are read as DB-API cursors,
+    compiled templates and functions are kept for next runs
+
+    usage:
+        with Pipeline([{'type': 'textfsm', 'db_name': 'x', 'table_name': 'ports', 'template': template}]) as p:
+            p.run(texts={'ports': [('router1', router1_text), ('router2', router2_bytes)]})
+            for row in p.rows('ports'):
+                print(row)
+    """
+
+    def __init__(self, config, database=':memory:'):
+        """ config is part list, single part dict, ConfigPlan or yaml file path,
+        database is ':memory:' or sqlite file path """
+        import sqlite3
+        if isinstance(config, dict):
+            config = [config]
+        if isinstance(config, list):
+            self.plan = ConfigPlan.from_parts(
+                config, '<pipeline>', require_files=False)
+        else:
+            self.plan = ConfigPlan.from_config(config)
+        self.database = database
+        self.con = sqlite3.connect(database)
+        # cursors of query(), closed before tables are replaced (open cursor locks tables)
+        self._cursors = weakref.WeakSet()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """ close sqlite connection """
+        self._close_cursors()
+        if self.con is not None:
+            self.con.close()
+            self.con = None
+
+    def _close_cursors(self):
+        for cursor in list(self._cursors):
+            cursor.close()
+        self._cursors.clear()
+
+    @staticmethod
+    def _texts(texts):
+        """ yield (host, text) from text, bytes, dict {host: text} or iterable of (host, text) """
+        if isinstance(texts, (str, bytes)):
+            texts = [('', texts)]
+        elif isinstance(texts, dict):
+            texts = texts.items()
+        for host, text in texts:
+            if isinstance(text, bytes):
+                text = text.decode('utf-8', errors='ignore')
+            yield host, text
+
+    @staticmethod
+    def _table_name(part) -> str:
+        return part['table_name'].replace('.', '_').replace('-', '_')
+
+    def _textfsm_part(self, table) -> dict:
+        for part in self.plan.textfsm:
+            if Pipeline._table_name(part) == table:
+                return part
+        raise KeyError(f'no textfsm part with table_name <{table}>')
+
+    def parse(self, part, texts, replace=False) -> int:
+        """ parse texts with textfsm part (or its table_name) into part table,
+        replace drop table before parse, return row count """
+        if isinstance(part, str):
+            part = self._textfsm_part(part)
+        table_name = Pipeline._table_name(part)
+        engine = str(part.get('engine', 'textfsm')).lower()
+        fsm = TemplateCache.get(part['template'], engine)
+        column_types = ColumnTypes.from_part(part, fsm)
+        if replace:
+            self._close_cursors()
+            self.con.execute('drop table if exists ' + table_name)
+        with SqlLoader(
+                table_name, batch_size=part.get('batch_size', 50000),
+                column_types=column_types, con=self.con) as loader:
+            # table exists for sqljoin parts even if texts give no rows
+            loader.create_table(['Filename'] + fsm.header, table_name)
+            for host, text in Pipeline._texts(texts):
+                start = time.perf_counter()
+                # template errors raised to caller (no SystemExit in library)
+                result = Textfsmv._textfsm_result(
+                    text, part['template'], host, engine)
+                Metrics.add(table_name, 'textfsm parse',
+                            seconds=time.perf_counter() - start,
+                            rows=len(result) - 1, bytes_read=len(text))
+                rows = result[1:]
+                if column_types is None:
+                    rows = Parsev.all_element_to_str(rows)
+                loader.add(rows, result[0], table_name)
+        return loader.rows
+
+    def run(self, texts=None) -> list:
+        """ run all parts in stage order (excel, textfsm, sqljoin), texts is dict {table_name: texts}
+        for textfsm parts (parts without texts parse own files/folders), tables are replaced,
+        return table names in pipeline database, cursors of previous run are closed """
+        texts = texts or {}
+        self._close_cursors()
+        for part in self.plan.excel:
+            Excel2Sql.excel_to_sql(
+                part['excel_file'], excel_sheets=part.get('excel_sheets'),
+                db_name=self.database, replace=True,
+                batch_size=part.get('batch_size', 10000), con=self.con)
+        for part in self.plan.textfsm:
+            table_name = Pipeline._table_name(part)
+            if table_name in texts:
+                part_texts = texts[table_name]
+            elif 'files' in part or 'folders' in part:
+                part_texts = (
+                    (host, Pipeline._read_file(path))
+                    for path, host in Textfsmv._host_files_from_part(part)[0])
+            else:
+                continue
+            self.parse(part, part_texts, replace=True)
+        for part in self.plan.sqljoin:
+            Sqljoinv.run_sqljoin(self.con, part, self.plan)
+        return self.tables()
+
+    @staticmethod
+    def _read_file(path) -> str:
+        with open(path, encoding='utf-8', errors='ignore') as file:
+            return file.read()
+
+    def query(self, sqlcommand, parameters=()):
+        """ run sql command on pipeline database, return sqlite3 cursor (iterate for rows, description for headers) """
+        cursor = self.con.execute(sqlcommand, parameters)
+        self._cursors.add(cursor)
+        return cursor
+
+    def rows(self, table):
+        """ cursor of all table rows """
+        return self.query('select * from ' + table)
+
+    def tables(self) -> list:
+        """ table names in pipeline database """
+        return [i[0] for i in self.query(
+            "select name from sqlite_master where type = 'table' and name not like 'sqlite_%'")]
+
+
+def run_config(config_file_paths, args, report_file=None):
+    ''' run all parts of config file(s) with dependency scheduler, write run report (and cProfile dump with args.profile),
+    with args.dry_run only print plan, with args.watch keep running for changed files after first run '''
+    if isinstance(config_file_paths, str):
+        config_file_paths = [config_file_paths]
+    if args.watch:
+        # watch mode updates stable db
+        args.incremental = True
+    timestamp = '' if args.incremental else '_' + time.strftime("%Y%m%d-%H%M%S")
+    # report of resumed run not overwrites report of first run
+    report_timestamp = timestamp
+    if args.resume:
+        # same db, only not completed parts and not parsed files
+        timestamp = Checkpoint.resume_timestamp(args.resume)
+    if report_file is None:
+        report_file = os.path.splitext(os.path.basename(config_file_paths[0]))[0]
+    # parse and validate configs once for all stages
+    plans = [ConfigPlan.load(i) for i in config_file_paths]
+    scheduler = Scheduler(
+        plans, timestamp, workers=args.workers,
+        incremental=args.incremental or bool(args.resume),
+        resume=bool(args.resume))
+    if args.dry_run:
+        print(scheduler.describe())
+        return
+    if not args.resume:
+        Checkpoint.reset({i['db'] for i in scheduler.nodes})
+    Metrics.reset()
+    profile = cProfile.Profile() if args.profile else None
+    if profile:
+        profile.enable()
+    try:
+        # file snapshot before first run, files changed during run are parsed at first watch check
+        watcher = Watcher(scheduler, args.interval) if args.watch else None
+        export_tables, failed = scheduler.run(jobs=args.jobs)
+        for plan in plans:
+            plan.function_registry.log_stats()
+        # all excel sheets of a db written once at the end
+        Parsev.export(export_tables, args.export_format)
+        if watcher:
+            if failed:
+                error(f"{len(failed)} part(s) failed: {', '.join(i['name'] for i in failed)}")
+            info(f'WATCH <{", ".join(config_file_paths)}> STARTED! (Ctrl+C to stop)')
+            watcher.watch(args.jobs, args.export_format)
+        elif failed:
+            raise Exception(
+                f"{len(failed)} part(s) failed: {', '.join(i['name'] for i in failed)}")
+    finally:
+        scheduler.close()
+        if profile:
+            profile.disable()
+            profile.dump_stats(f'{report_file}_PROFILE{report_timestamp}.prof')
+        Metrics.write_report(
+            f'{report_file}_REPORT{report_timestamp}', ', '.join(config_file_paths))
+
+
+def pause(args, message):
+    ''' wait key press only in interactive console (e.g. double click on windows), headless runs exit directly '''
+    if args.no_prompt or args.watch or sys.stdin is None or not sys.stdin.isatty():
+        return
+    input(message)
 
 
 def main():
     ''' main function to run parse2excel '''
+    import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument(
         'configfile',
         help='config yaml file path [e.g. srlinux_config_1.yaml] (OPTIONAL default: file=config.yaml, folder=P2E_CONFIGS)',
         nargs='?')
+    parser.add_argument(
+        '--workers',
+        help='process count for textfsm parsing, 0 for all cpu (OPTIONAL default: 1, config part "workers" key overrides)',
+        type=int, default=1)
+    parser.add_argument(
+        '--incremental',
+        help='write to stable db (without timestamp) and parse only new/changed files (OPTIONAL)',
+        action='store_true')
+    parser.add_argument(
+        '--jobs',
+        help='count of independent config parts run in parallel, parts of same db never write at same time (OPTIONAL default: 1)',
+        type=int, default=1)
+    parser.add_argument(
+        '--dry-run',
+        help='print dependency plan of config parts and exit (OPTIONAL)',
+        action='store_true')
+    parser.add_argument(
+        '--profile',
+        help='write cProfile dump <config>_PROFILE<timestamp>.prof for each config file (OPTIONAL)',
+        action='store_true')
+    parser.add_argument(
+        '--export-format',
+        help='export format(s) of tables, comma separated xlsx, csv, csv.gz, parquet, arrow (OPTIONAL default: xlsx, config part "export_format" key overrides)',
+        default='xlsx')
+    parser.add_argument(
+        '--watch',
+        help='keep running, parse new/changed files and run dependent parts again (stable db as --incremental) (OPTIONAL)',
+        action='store_true')
+    parser.add_argument(
+        '--interval',
+        help='seconds between file checks in watch mode (OPTIONAL default: 2)',
+        type=float, default=2.0)
+    parser.add_argument(
+        '--resume',
+        help='continue run of db [e.g. my_p2e_excel_20261017-120000.sqlite3] from last checkpoint, completed parts and parsed files skipped (OPTIONAL)',
+        metavar='DB')
+    parser.add_argument(
+        '--no-prompt',
+        help='exit without "Press any key" prompt, exit code 1 if not done (OPTIONAL default: prompt only in interactive console)',
+        action='store_true')
     args = parser.parse_args()
+    setup_logging()
+    not_done = False
     if args.configfile:
         config_file_path = args.configfile
     else:
@@ -507,35 +2554,49 @@ def main():
 
     if os.path.exists(config_file_path):
         try:
-            timestamp = '_' + time.strftime("%Y%m%d-%H%M%S")
             info(f'START <{config_file_path}> CONFIG FILE!')
-            Excel2Sql.excel_run_yaml(config_file_path, timestamp)
-            Textfsmv.textfsmv_run_yaml(config_file_path, timestamp)
-            Sqljoinv.sqljoinv_run_yaml(config_file_path, timestamp)
+            run_config(config_file_path, args)
             info('ALL DONE!')
-            input('!!! ALL DONE! Press any key to exit...')
+            pause(args, '!!! ALL DONE! Press any key to exit...')
         except Exception as e:
             error(
                 f'NOT DONE! CHECK ERRORS AT <textfsm_CONFIG.yaml> CONFIG FILE! : {e}')
-            input('!!! NOT DONE! CHECK ERRORS! Press any key to exit...')
+            not_done = True
+            pause(args, '!!! NOT DONE! CHECK ERRORS! Press any key to exit...')
+    elif os.path.exists('P2E_CONFIGS') and (args.jobs > 1 or args.dry_run or args.watch):
+        # all config files scheduled together
+        config_files = sorted(os.listdir('P2E_CONFIGS'))
+        try:
+            info(f'START <{", ".join(config_files)}> CONFIG FILES!')
+            run_config(
+                [os.path.join('P2E_CONFIGS', i) for i in config_files], args,
+                report_file='P2E_CONFIGS')
+            info('ALL DONE!')
+            pause(args, '!!! ALL DONE! Press any key to exit...')
+        except Exception as e:
+            error(
+                f'NOT DONE! CHECK ERRORS AT <P2E_CONFIGS> CONFIG FILES! : {e}')
+            not_done = True
+            pause(args, '!!! NOT DONE! CHECK ERRORS! Press any key to exit...')
     elif os.path.exists('P2E_CONFIGS'):
         for config_file in os.listdir('P2E_CONFIGS'):
             config_file_path = os.path.join('P2E_CONFIGS', config_file)
             try:
-                timestamp = '_' + time.strftime("%Y%m%d-%H%M%S")
                 info(f'START <{config_file}> CONFIG FILE!')
-                Excel2Sql.excel_run_yaml(config_file_path, timestamp)
-                Textfsmv.textfsmv_run_yaml(config_file_path, timestamp)
-                Sqljoinv.sqljoinv_run_yaml(config_file_path, timestamp)
+                run_config(config_file_path, args)
                 info('ALL DONE!')
-                input('!!! ALL DONE! Press any key to exit...')
+                pause(args, '!!! ALL DONE! Press any key to exit...')
             except Exception as e:
                 error(
                     f'NOT DONE! CHECK ERRORS AT <{config_file}> CONFIG FILE! : {e}')
-                input('!!! NOT DONE! CHECK ERRORS! Press any key to exit...')
+                not_done = True
+                pause(args, '!!! NOT DONE! CHECK ERRORS! Press any key to exit...')
     else:
-        input(
-            '!!! NOT DONE! <textfsm_CONFIG.yaml> file not found! Press any key to exit...')
+        not_done = True
+        pause(
+            args, '!!! NOT DONE! <textfsm_CONFIG.yaml> file not found! Press any key to exit...')
+    if not_done:
+        raise SystemExit(1)
 
 
 if __name__ == "__main__":